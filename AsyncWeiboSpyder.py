@@ -0,0 +1,205 @@
+"""
+WeiboSpyder 的异步版本（需要 aiohttp）
+
+需要联网的属性返回协程，用法为 await w.text、await c.comment；
+返回结构与 WeiboSpyder 中的同名类一致，便于逐个调用点迁移。
+"""
+import asyncio
+from functools import cached_property, wraps
+import AsyncWeiboutils as AWBapi
+import Weiboutils as WBapi
+from WeiboSpyder import Comment, User, Weibo
+
+
+def _cached_awaitable(func):
+    """
+    把协程方法变为只请求一次的属性：首次访问时创建 Task 并缓存，
+    之后的访问（包括并发访问）都 await 同一个 Task；失败时下次访问重新请求。
+    refresh() 清除缓存。
+    """
+    name = func.__name__
+
+    @property
+    @wraps(func)
+    def prop(self):
+        task = self.__dict__.get(name)
+        if task is None or (task.done() and (task.cancelled() or task.exception())):
+            task = asyncio.ensure_future(func(self))
+            self.__dict__[name] = task
+        return task
+    return prop
+
+
+class AsyncComment(Comment):
+    """
+    use uid and mid to init
+
+    awaitable attrs: raw,comment
+    """
+
+    @_cached_awaitable
+    async def raw(self):
+        return await AWBapi.get_comment(self._uid, self._mid)
+
+    @_cached_awaitable
+    async def comment(self):
+        return self._format(await self.raw)
+
+
+class AsyncUser:
+    """
+    use `await AsyncUser.create(uid or user-page-url)` to init
+
+    attrs: uid,info,shortinfo
+    awaitable attrs: fans,follows
+    methods: get_Weibo (async)
+    """
+
+    def __init__(self, uid: int, info: dict) -> None:
+        self.uid = uid
+        self.info = info
+        self.shortinfo = {k: self.info[k] for k in User.shortinfo_keys}
+
+    @classmethod
+    async def create(cls, arg: 'int|str'):
+        try:
+            uid = int(arg)
+        except Exception:
+            uid = await AWBapi.get_uid_from_url(arg)
+        info = (await AWBapi.get_user_info(uid))['data']['user']
+        return cls(uid, info)
+
+    async def get_Weibo(self, pages=3):
+        return [AsyncWeibo(w) for w in await AWBapi.get_user_weibo(self.uid, pages)]
+
+    @property
+    def fans(self):
+        return AWBapi.get_user_follow(
+            self.uid, 1, self.info['followers_count'])
+
+    @property
+    def follows(self):
+        return AWBapi.get_user_follow(
+            self.uid, 0, self.info['friends_count'])
+
+
+class AsyncWeibo(Weibo):
+    """
+    attrs: raw,createdtime,statistic,comment
+    awaitable attrs: user,text,media,retweet
+            首次访问时获取并缓存，调用 refresh() 后重新获取
+    """
+
+    @_cached_awaitable
+    async def user(self):
+        return await AsyncUser.create(self._user_arg())
+
+    @_cached_awaitable
+    async def text(self):
+        mblogid = self._longtext_id()
+        return self._with_longtext(await AWBapi.get_longtext(mblogid) if mblogid else None)
+
+    @_cached_awaitable
+    async def media(self):
+        video_id = self._video_id()
+        return self._with_video(await AWBapi.get_video_urls(video_id) if video_id else None)
+
+    @_cached_awaitable
+    async def retweet(self):
+        fid = self._retweet_id()
+        if fid:
+            return AsyncWeibo(await AWBapi.get_status(fid))
+        else:
+            return None
+
+    @cached_property
+    def comment(self):
+        if 'visible' not in self.raw.keys():
+            return AsyncComment(self.raw['act']['comment']['uid'], self.raw['act']['comment']['mid'])
+        else:
+            return AsyncComment(self.raw['user']['id'], self.raw['mid'])
+
+
+class AsyncWeiboSpyder:
+    """
+    need cookies to init (a cookies string, or a list of them for an account pool)
+
+    awaitable attrs: allGroups,topicband,hotband
+    methods (async): hotWeibos,search
+    """
+
+    def __init__(self, cookies: 'str|list') -> None:
+        self.refresh_cookies(cookies)
+
+    @property
+    def allGroups(self):
+        return self._allGroups()
+
+    async def _allGroups(self):
+        band, cat = await AWBapi.get_allGroups()
+        band.update(cat)
+        return band
+
+    @property
+    def topicband(self):
+        return AWBapi.get_topicband()
+
+    @property
+    def hotband(self):
+        return AWBapi.get_hotband()
+
+    def refresh_cookies(self, cookies: 'str|list'):
+        """
+        同 WeiboSpyder.refresh_cookies
+        """
+        if isinstance(cookies, str):
+            WBapi.clear_accounts()
+            WBapi.set_cookies(cookies)
+            WBapi.set_headers()
+        else:
+            WBapi.set_accounts(cookies)
+
+    async def hotWeibos(self, title: str = '24小时榜', num=100):
+        """
+        获取不同类别或时段的热门微博，同 WeiboSpyder.hotWeibos
+
+        return list of AsyncWeibo
+        """
+        return [AsyncWeibo(w) for w in await AWBapi.get_hotWeibos(title, num)]
+
+    async def iter_hotWeibos(self, title: str = '24小时榜', num=100):
+        """
+        同 hotWeibos，为异步生成器
+        """
+        async for w in AWBapi.iter_hotWeibos(title, num):
+            yield AsyncWeibo(w)
+
+    async def search(self, keyword: str, searchtype: str = 'weibo', num=10, **search_param):
+        """
+        搜索微博，同 WeiboSpyder.search
+
+        return:list of searchtype
+        """
+        items = await AWBapi.search_Weibo(
+            keyword, searchtype, num, **search_param)
+        if searchtype == 'user':
+            return list(await asyncio.gather(*[AsyncUser.create(u['url']) for u in items]))
+        elif searchtype == 'topic':
+            return items
+        else:
+            return [AsyncWeibo(w) for w in items]
+
+    async def iter_search(self, keyword: str, searchtype: str = 'weibo', num=10, **search_param):
+        """
+        同 search，为异步生成器；user 类型逐个产出已获取 info 的 AsyncUser
+        """
+        async for d in AWBapi.iter_search_Weibo(keyword, searchtype, num, **search_param):
+            if searchtype == 'user':
+                yield await AsyncUser.create(d['url'])
+            elif searchtype == 'topic':
+                yield d
+            else:
+                yield AsyncWeibo(d)
+
+    async def close(self):
+        await AWBapi.get_async_transport().close()
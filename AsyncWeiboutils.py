@@ -0,0 +1,358 @@
+"""
+Weiboutils 的异步版本（需要 aiohttp）
+
+接口名、参数与返回结构均与 Weiboutils 一致，只是需要 await；
+请求构造与解析直接复用 Weiboutils 中的实现，cookies 仍由 Weiboutils.set_headers 设置。
+"""
+import asyncio
+from collections import deque
+from typing import TYPE_CHECKING
+import Weiboutils as WBapi
+from Weiboutils import parse_Weibo_tag, parse_userortopic_tag
+from Weibotransport import get_async_transport, set_async_transport
+
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup
+
+
+async def _iter_pages(fetch_page, num, page_size, workers=None, is_last=None, pages=None):
+    """
+    同 Weiboutils._iter_pages，为异步生成器
+    """
+    workers = workers or WBapi.page_workers
+    is_last = is_last or (lambda items: not items)
+    tasks = deque()
+    count = 0
+    page = 1
+    try:
+        while num is None or count < num:
+            wanted = workers if num is None else -(-(num - count) // page_size)
+            while len(tasks) < min(wanted, workers) and (pages is None or page <= pages):
+                tasks.append(asyncio.ensure_future(fetch_page(page)))
+                page += 1
+            if not tasks:
+                return
+            page_items = await tasks.popleft()
+            if num is not None:
+                page_items = page_items[:num - count]
+            for item in page_items:
+                yield item
+            count += len(page_items)
+            if is_last(page_items):
+                return
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def _collect(aiter) -> list:
+    return [item async for item in aiter]
+
+
+async def get_hotband():
+    """
+    热搜榜，同 Weiboutils.get_hotband
+    """
+    url = "https://weibo.com/ajax/statuses/hot_band"
+    r = await get_async_transport().get(url)
+    assert r.status_code == 200
+    return WBapi._parse(r, WBapi._parse_hotband)
+
+
+async def get_topicband():
+    """
+    话题榜，同 Weiboutils.get_topicband
+    """
+    url = 'https://weibo.com/ajax/statuses/topic_band'
+    r = await get_async_transport().get(url)
+    assert r.status_code == 200
+    return WBapi._parse(r, WBapi._parse_topicband)
+
+
+async def get_allGroups():
+    """
+    获取分组，同 Weiboutils.get_allGroups
+    """
+    url = 'https://weibo.com/ajax/feed/allGroups'
+    r = await get_async_transport().get(url, headers=WBapi._headers)
+    assert r.status_code == 200
+    return WBapi._parse(r, WBapi._parse_allGroups)
+
+
+async def get_hotWeibos(title: str = '24小时榜', num=100):
+    """
+    获取不同类别或时段的热门微博，同 Weiboutils.get_hotWeibos
+    """
+    return await _collect(iter_hotWeibos(title, num))
+
+
+async def iter_hotWeibos(title: str = '24小时榜', num=100):
+    """
+    同 Weiboutils.iter_hotWeibos，为异步生成器
+    """
+    groups, g1 = await get_allGroups()
+    groups.update(g1)
+    gid = groups[title]['gid']
+    cid = groups[title]['containerid']
+
+    url = "https://weibo.com/ajax/feed/hottimeline"
+
+    async def fetch_page(page):
+        params = {
+            "group_id": gid,
+            "containerid": cid,
+            "extparam": "discover|new_feed",
+            'max_id': page
+        }
+        r = await get_async_transport().get(url, headers=WBapi._headers, params=params)
+        assert r.status_code == 200
+        return WBapi._parse(r)['statuses']
+
+    if num > 400:
+        num = 400
+    async for item in _iter_pages(fetch_page, num, WBapi._hot_page_size):
+        yield item
+
+
+async def search_Weibo_raw(keyword: str, searchtype: str = 'weibo', page=1, **search_param) -> 'BeautifulSoup':
+    """
+    搜索微博(原始接口)，同 Weiboutils.search_Weibo_raw
+    """
+    return WBapi._search_soup(await search_Weibo_html(keyword, searchtype, page, **search_param), searchtype)
+
+
+async def search_Weibo_html(keyword: str, searchtype: str = 'weibo', page=1, **search_param) -> str:
+    """
+    同 Weiboutils.search_Weibo_html
+    """
+    url, params_dict = WBapi._search_request(
+        keyword, searchtype, page, search_param)
+    r = await get_async_transport().get(url, headers=WBapi._headers, params=params_dict)
+    assert r.status_code == 200
+    return r.text
+
+
+async def search_Weibo_tags(keyword: str, searchtype: str = 'weibo', num=10, **search_param) -> list:
+    """
+    搜索微博（中间接口），同 Weiboutils.search_Weibo_tags
+    """
+    return await _collect(iter_search_Weibo_tags(keyword, searchtype, num, **search_param))
+
+
+async def iter_search_Weibo_tags(keyword: str, searchtype: str = 'weibo', num=10, **search_param):
+    """
+    同 Weiboutils.iter_search_Weibo_tags，为异步生成器
+    """
+    async def fetch_page(page):
+        return WBapi._search_tags_result(await search_Weibo_html(keyword, searchtype, page, **search_param), searchtype)
+
+    async for tag in _iter_search(fetch_page, searchtype, num, search_param):
+        yield tag
+
+
+async def search_Weibo(keyword: str, searchtype: str = 'weibo', num=10, **search_param) -> list:
+    """
+    搜索微博并解析（快速解析路径），同 Weiboutils.search_Weibo
+    """
+    return await _collect(iter_search_Weibo(keyword, searchtype, num, **search_param))
+
+
+async def iter_search_Weibo(keyword: str, searchtype: str = 'weibo', num=10, **search_param):
+    """
+    同 Weiboutils.iter_search_Weibo，为异步生成器
+    """
+    async def fetch_page(page):
+        return WBapi._search_result(await search_Weibo_html(keyword, searchtype, page, **search_param), searchtype)
+
+    async for d in _iter_search(fetch_page, searchtype, num, search_param):
+        yield d
+
+
+async def _iter_search(fetch_page, searchtype: str, num: int, search_param: dict):
+    """
+    同 Weiboutils._iter_search，为异步生成器
+    """
+    first, max_count, last_page = await fetch_page(1)
+    num, pages = WBapi._search_bounds(searchtype, num, search_param, max_count, last_page)
+
+    async def page_items(page):
+        return first if page == 1 else (await fetch_page(page))[0]
+
+    async for item in _iter_pages(page_items, num, len(first) or WBapi._search_page_size, pages=pages):
+        yield item
+
+
+async def get_comment(uid: 'int|str', mid: 'int|str') -> dict:
+    """
+    通过 uid 和 mid 获取评论，同 Weiboutils.get_comment
+    """
+    url = "https://weibo.com/ajax/statuses/buildComments"
+    r = await get_async_transport().get(
+        url, params=WBapi._comment_params(uid, mid), headers=WBapi._headers)
+    assert r.status_code == 200
+    return WBapi._parse(r)['data']
+
+
+async def get_comment_page(uid: 'int|str', id: 'int|str', max_id=0, level=0, count=20) -> tuple:
+    """
+    按 max_id 游标获取一页评论，同 Weiboutils.get_comment_page
+    """
+    url = "https://weibo.com/ajax/statuses/buildComments"
+    r = await get_async_transport().get(
+        url, params=WBapi._comment_page_params(uid, id, max_id, level, count), headers=WBapi._headers)
+    assert r.status_code == 200
+    return WBapi._parse(r, WBapi._parse_comment_page)
+
+
+async def iter_comments(uid: 'int|str', mid: 'int|str', replies=False, max_id=0):
+    """
+    同 Weiboutils.iter_comments，为异步生成器
+    """
+    while True:
+        comments, max_id = await get_comment_page(uid, mid, max_id)
+        if replies:
+            reply_lists = await asyncio.gather(*[
+                _collect(iter_replies(uid, c['id'])) if c.get('total_number') else _empty()
+                for c in comments])
+            for c, reply_list in zip(comments, reply_lists):
+                c['replies'] = reply_list
+        for c in comments:
+            yield c
+        if not max_id or not comments:
+            return
+
+
+async def _empty() -> list:
+    return []
+
+
+async def iter_replies(uid: 'int|str', cid: 'int|str'):
+    """
+    同 Weiboutils.iter_replies，为异步生成器
+    """
+    max_id = 0
+    while True:
+        comments, max_id = await get_comment_page(uid, cid, max_id, level=1)
+        for c in comments:
+            yield c
+        if not max_id or not comments:
+            return
+
+
+async def get_uid_from_url(url: str) -> str:
+    uid = WBapi._uid_in_url(url)
+    if uid is None:
+        req_url = "https://weibo.com/ajax/profile/info"
+        r = await get_async_transport().get(
+            req_url, headers=WBapi._headers, params=WBapi._profile_params_from_url(url))
+        assert r.status_code == 200
+        uid = WBapi._parse(r)['data']['user']['idstr']
+    return uid
+
+
+async def get_user_info(uid: 'str|int') -> dict:
+    """
+    return json-like dict
+    """
+    url = "https://weibo.com/ajax/profile/info"
+    r = await get_async_transport().get(url, headers=WBapi._headers, params={"uid": uid})
+    assert r.status_code == 200
+    return WBapi._parse(r)
+
+
+async def get_user_follow(uid: 'str|int', flag: '0|1', num: int) -> list:
+    """
+    获取粉丝或关注，同 Weiboutils.get_user_follow
+    """
+    return await _collect(iter_user_follow(uid, flag, num))
+
+
+async def iter_user_follow(uid: 'str|int', flag: '0|1', num: int = None):
+    """
+    同 Weiboutils.iter_user_follow，为异步生成器
+    """
+    num = WBapi._follow_limit(await get_user_info(uid), flag, num)
+
+    url = "https://weibo.com/ajax/friendships/friends"
+
+    async def fetch_page(page):
+        r = await get_async_transport().get(url, headers=WBapi._headers,
+                                            params=WBapi._follow_params(uid, flag, page))
+        assert r.status_code == 200
+        return WBapi._parse(r)['users']
+
+    async for user in _iter_pages(fetch_page, num, WBapi._follow_page_size,
+                                  is_last=lambda u_list: len(u_list) < WBapi._follow_page_size):
+        yield user
+
+
+async def get_user_weibo(uid: 'str|int', pages=3) -> list:
+    """
+    获取用户微博，同 Weiboutils.get_user_weibo
+    """
+    return await _collect(iter_user_weibo(uid, pages))
+
+
+async def iter_user_weibo(uid: 'str|int', pages=3):
+    """
+    同 Weiboutils.iter_user_weibo，为异步生成器
+    """
+    url = "https://weibo.com/ajax/statuses/mymblog"
+
+    async def fetch_page(page):
+        params = {
+            "uid": uid,
+            "page": page
+        }
+        r = await get_async_transport().get(url, headers=WBapi._headers, params=params)
+        assert r.status_code == 200
+        return WBapi._parse(r)['data']['list']
+
+    async for item in _iter_pages(fetch_page, None, 1, pages=pages):
+        yield item
+
+
+async def get_feeds(num=30) -> list:
+    """
+    获取我关注的最新微博，同 Weiboutils.get_feeds
+    """
+    url = "https://weibo.com/ajax/feed/friendstimeline"
+    params = {
+        "list_id": "null",
+        "count": num
+    }
+
+    r = await get_async_transport().get(url, headers=WBapi._headers, params=params)
+    assert r.status_code == 200
+    return WBapi._parse(r)['statuses'][:num]
+
+
+async def get_longtext(mblogid: str) -> str:
+    """
+    获取被折叠（展开）微博的全文，同 Weiboutils.get_longtext
+    """
+    url = "https://weibo.com/ajax/statuses/longtext"
+    r = await get_async_transport().get(url, headers=WBapi._headers, params={"id": mblogid})
+    assert r.status_code == 200
+    return WBapi._parse(r)['data']['longTextContent']
+
+
+async def get_status(mblogid: str) -> dict:
+    """
+    通过 mblogid 获取单条微博，同 Weiboutils.get_status
+    """
+    url = "https://weibo.com/ajax/statuses/show"
+    r = await get_async_transport().get(url, headers=WBapi._headers, params={"id": mblogid})
+    assert r.status_code == 200
+    return WBapi._parse(r)
+
+
+async def get_video_urls(video_id: str) -> 'dict|None':
+    """
+    通过视频 fid 获取播放地址，同 Weiboutils.get_video_urls
+    """
+    url = "https://weibo.com/tv/api/component"
+    params, headers_dict = WBapi._video_request(video_id)
+    r = await get_async_transport().post(url, params=params, headers=headers_dict)
+    assert r.status_code == 200
+    return WBapi._parse(r, WBapi._parse_video_urls)
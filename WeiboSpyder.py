@@ -1,5 +1,11 @@
 import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property
 import Weiboutils as WBapi
+from Weiborecords import UserRecord, WeiboRecord
+
+logger = logging.getLogger(__name__)
 
 
 class Comment:
@@ -7,25 +13,50 @@ class Comment:
     use uid and mid to init
 
     attrs: uid,mid,comments
+            raw 和 comment 首次访问时获取并缓存，调用 refresh() 后重新获取
+    methods: iter_comment
     """
 
+    _cached_attrs = ('raw', 'comment')
+
     def __init__(self, uid, mid) -> None:
         self._uid = uid
         self._mid = mid
 
-    @property
+    def refresh(self):
+        for attr in self._cached_attrs:
+            self.__dict__.pop(attr, None)
+
+    @cached_property
     def raw(self):
         return WBapi.get_comment(self._uid, self._mid)
 
-    @property
+    @cached_property
     def comment(self):
+        return self._format(self.raw)
+
+    def iter_comment(self, replies=False):
+        """
+        沿 max_id 游标获取全部评论（不受 comment 的 100 条限制），逐条产出
+
+        replies: 为 True 时每条评论附带 replies（二级评论，格式相同）
+        需要断点续爬或多条微博并发时使用 Weibocomments.CommentCrawler
+        """
+        for c in WBapi.iter_comments(self._uid, self._mid, replies):
+            d = self._format([c])[0]
+            if replies:
+                d['replies'] = self._format(c['replies'])
+            yield d
+
+    @staticmethod
+    def _format(raw):
         return [{
             'uid': c['user']['id'],
             'name':c['user']['name'],
             'created_at':c['created_at'],
             'text':c['text'],
             'text_raw':c['text_raw']
-        } for c in self.raw]
+        } for c in raw]
 
 
 class User:
@@ -33,54 +64,111 @@ class User:
     use uid or user-page-url to init
 
     attrs: uid,info,shortinfo,fans,follows
+            uid 和 info 在首次访问时才请求，创建 User 本身不联网；
+            多个 User 可用 resolve_users 批量并发获取。
             获取 fans 和 follows 为获取全部，量较大时很慢，取决于网速。
             可用 Weiboutils 中的 api 获取指定 num。
+    compact: 为 True 时 info、fans、follows 为 Weiborecords.UserRecord，
+             get_Weibo 返回 CompactWeibo，只保留常用字段以节省内存
     methods: get_Weibo
     """
 
-    def __init__(self, arg: 'int|str') -> None:
+    shortinfo_keys = ('id', 'screen_name', 'profile_url',
+                      'followers_count', 'friends_count')
+
+    def __init__(self, arg: 'int|str', compact=False) -> None:
+        self._arg = arg
+        self._compact = compact
+
+    @cached_property
+    def uid(self):
         try:
-            uid = int(arg)
+            return int(self._arg)
         except Exception:
-            uid = WBapi.get_uid_from_url(arg)
-        self.uid = uid
-        self.info = self._get_user_info_(self.uid)['data']['user']
-        shortinfo_keys = ('id', 'screen_name', 'profile_url',
-                          'followers_count', 'friends_count')
-        self.shortinfo = {k: self.info[k] for k in shortinfo_keys}
+            return WBapi.get_uid_from_url(self._arg)
+
+    @cached_property
+    def info(self):
+        info = self._get_user_info_(self.uid)['data']['user']
+        return UserRecord.from_dict(info) if self._compact else info
+
+    @cached_property
+    def shortinfo(self):
+        return {k: self.info[k] for k in self.shortinfo_keys}
 
     def get_Weibo(self, pages=3):
-        return [Weibo(w) for w in WBapi.get_user_weibo(self.uid, pages)]
+        cls = CompactWeibo if self._compact else Weibo
+        return [cls(w) for w in WBapi.get_user_weibo(self.uid, pages)]
 
     @property
     def fans(self):
         return WBapi.get_user_follow(
-            self.uid, 1, self.info['followers_count'])
+            self.uid, 1, self.info['followers_count'], compact=self._compact)
 
     @property
     def follows(self):
         return WBapi.get_user_follow(
-            self.uid, 0, self.info['friends_count'])
+            self.uid, 0, self.info['friends_count'], compact=self._compact)
 
     def _get_user_info_(self, uid):
         return WBapi.get_user_info(uid)
 
 
+def resolve_users(users: list, workers=None) -> list:
+    """
+    并发获取多个 User 的 uid 和 info
+
+    以相同 uid 或 url 创建的 User 只请求一次，profile 响应另由 Weiboutils 的响应缓存复用；
+    获取失败的用户记录日志后跳过，保持未获取状态，访问时再请求
+
+    return users
+    """
+    same_users = {}
+    for u in users:
+        same_users.setdefault(str(u._arg), []).append(u)
+
+    def resolve(same):
+        first = same[0]
+        try:
+            first.info
+        except Exception as e:
+            logger.warning('resolve user %s failed: %r', first._arg, e)
+            return
+        for u in same[1:]:
+            u.__dict__.update(uid=first.uid, info=first.info)
+
+    with ThreadPoolExecutor(workers or WBapi.page_workers) as executor:
+        list(executor.map(resolve, same_users.values()))
+    return users
+
+
 class Weibo:
     """
     attrs: raw,user,createdtime,text,media,retweet
+            user,text,media,retweet,comment 首次访问时获取并缓存，
+            调用 refresh() 后重新获取（全文和转发原文同时从响应缓存中删除）
     """
 
+    _cached_attrs = ('user', 'text', 'media', 'retweet', 'comment')
+
     def __init__(self, weibo_dict: dict) -> None:
         self.raw = weibo_dict
 
-    @property
+    def refresh(self):
+        for attr in self._cached_attrs:
+            self.__dict__.pop(attr, None)
+        for mblogid in {self._longtext_id(), self._retweet_id()} - {None}:
+            WBapi.forget_status(mblogid)
+
+    @cached_property
     def user(self):
+        return User(self._user_arg())
+
+    def _user_arg(self):
         if 'visible' in self.raw.keys():
-            url = 'https://weibo.com'+self.raw['user']['profile_url']
+            return self.raw['user']['id']
         else:
-            url = self.raw['content']['info']['url']
-        return User(url)
+            return self.raw['content']['info']['url']
 
     @property
     def createdtime(self):
@@ -89,71 +177,77 @@ class Weibo:
         else:
             return self.raw['content']['time']
 
-    @property
+    @cached_property
     def text(self):
+        mblogid = self._longtext_id()
+        return self._with_longtext(WBapi.get_longtext(mblogid) if mblogid else None)
+
+    def _with_longtext(self, longtext: 'str|None') -> dict:
+        txt = self._text()
+        if longtext is not None:
+            txt['raw'] = longtext
+        return txt
+
+    def _text(self):
         if 'visible' not in self.raw.keys():
             return self.raw['content']['text']
         else:
-            txt = {
+            return {
                 'text': self.raw['text_raw'],
                 'raw': self.raw['text']
             }
-            if WBapi.re.search(r'>展开</span>', txt['raw']):
-                mblogid = self.raw['mblogid']
-                url = "https://weibo.com/ajax/statuses/longtext"
-                params = {
-                    "id": mblogid
-                }
-
-                r = WBapi.requests.get(
-                    url, headers=WBapi.get_headers(), params=params)
-                assert r.status_code == 200
-                txt['raw'] = WBapi.json.loads(
-                    r.content)['data']['longTextContent']
-            return txt
 
-    @property
+    def _longtext_id(self):
+        """
+        被折叠的微博返回其 mblogid，否则返回 None
+        """
+        if 'visible' in self.raw.keys() and WBapi.re.search(r'>展开</span>', self.raw['text']):
+            return self.raw['mblogid']
+        return None
+
+    @cached_property
     def media(self):
+        video_id = self._video_id()
+        return self._with_video(WBapi.get_video_urls(video_id) if video_id else None)
+
+    def _with_video(self, urls: 'dict|None') -> dict:
+        media_dict = self._media()
+        if urls:
+            media_dict['video'] = urls
+        return media_dict
+
+    def _media(self):
         if 'visible' not in self.raw.keys():
             return {
                 'video': self.raw['content']['video'],
                 'image': self.raw['content']['image']
             }
         else:
-            media_dict = {
+            return {
                 'video': [],
                 'image': ['https://wx1.sinaimg.cn/large/'+imgid+'.jpg' for imgid in self.raw['pic_ids']]
             }
-            if 'url_struct' in self.raw.keys():
-                long_url = self.raw['url_struct'][0]['long_url']
-                m = WBapi.re.search(r'fid=(\d+:\d+)', long_url)
-                if m:
-                    video_id = m.group(1)
-                else:
-                    return media_dict
-                url = "https://weibo.com/tv/api/component"
-                params = {
-                    "data": "{\"Component_Play_Playinfo\":{\"oid\":\""+video_id+"\"}}",
-                }
-                headers_dict = {
-                    "Referer": "https://weibo.com/tv/show/"+video_id+"?from=old_pc_videoshow"
-                }
-                headers_dict.update(WBapi.get_headers())
-                r = WBapi.requests.post(
-                    url, params=params, headers=headers_dict)
-                assert r.status_code == 200
-                content_dict = WBapi.json.loads(r.content)
-
-                def has_url(d):
-                    return ('data' in d) and (isinstance(d['data'], dict)) and ('Component_Play_Playinfo' in d['data']) and (isinstance(d['data']['Component_Play_Playinfo'], dict)) and ('urls' in d['data']['Component_Play_Playinfo'])
-
-                if has_url(content_dict):
-                    media_dict['video'] = content_dict['data']['Component_Play_Playinfo']['urls']
-
-            return media_dict
 
-    @property
+    def _video_id(self):
+        """
+        带视频的微博返回视频 fid，否则返回 None
+        """
+        if 'visible' in self.raw.keys() and 'url_struct' in self.raw.keys():
+            long_url = self.raw['url_struct'][0]['long_url']
+            m = WBapi.re.search(r'fid=(\d+:\d+)', long_url)
+            if m:
+                return m.group(1)
+        return None
+
+    @cached_property
     def retweet(self):
+        fid = self._retweet_id()
+        if fid:
+            return Weibo(WBapi.get_status(fid))
+        else:
+            return None
+
+    def _retweet_id(self):
         fid = None
         if 'visible' not in self.raw.keys():
             if self.raw['content']['forward']:
@@ -162,21 +256,9 @@ class Weibo:
         else:
             if 'retweeted_status' in self.raw.keys():
                 fid = self.raw['retweeted_status']['mblogid']
+        return fid
 
-        if fid:
-            url = "https://weibo.com/ajax/statuses/show"
-            params = {
-                "id": fid
-            }
-
-            r = WBapi.requests.get(
-                url, params=params, headers=WBapi.get_headers())
-            assert r.status_code == 200
-            return Weibo(WBapi.json.loads(r.content))
-        else:
-            return None
-
-    @property
+    @cached_property
     def comment(self):
         if 'visible' not in self.raw.keys():
             return Comment(self.raw['act']['comment']['uid'], self.raw['act']['comment']['mid'])
@@ -199,9 +281,117 @@ class Weibo:
             }
 
 
+class CompactWeibo(Weibo):
+    """
+    Weibo 的紧凑版本，只保存 Weiborecords.WeiboRecord 而非整段 json，
+    属性和方法同 Weibo；raw 仅在以 keep_raw=True 创建时可用，否则为 None
+
+    use Weibo dict or WeiboRecord to init
+    """
+
+    def __init__(self, weibo: 'dict|WeiboRecord', keep_raw=False) -> None:
+        if not isinstance(weibo, WeiboRecord):
+            weibo = WeiboRecord.from_dict(weibo, keep_raw)
+        self.record = weibo
+
+    @property
+    def raw(self):
+        return self.record.raw
+
+    def _user_arg(self):
+        return self.record.uid if self.record.user_url is None else self.record.user_url
+
+    @property
+    def createdtime(self):
+        if self.record.user_url is None:
+            return WBapi.dt.datetime.strptime(self.record.created_at, WBapi.time_pat).isoformat()
+        return self.record.created_at
+
+    def _text(self):
+        return {
+            'text': self.record.text,
+            'raw': self.record.text_html
+        }
+
+    def _longtext_id(self):
+        return self.record.longtext_id
+
+    def _media(self):
+        return {
+            'video': [] if self.record.user_url is None else self.record.video,
+            'image': None if self.record.images is None else list(self.record.images)
+        }
+
+    def _video_id(self):
+        return self.record.video_id
+
+    @cached_property
+    def retweet(self):
+        fid = self._retweet_id()
+        if fid:
+            return CompactWeibo(WBapi.get_status(fid), self.record.raw is not None)
+        return None
+
+    def _retweet_id(self):
+        return self.record.retweet_id
+
+    @cached_property
+    def comment(self):
+        return Comment(self.record.uid, self.record.mid)
+
+    @property
+    def statistic(self):
+        return {
+            'forward': self.record.forward,
+            'comment': self.record.comment,
+            'like': self.record.like
+        }
+
+
+def resolve_media(weibos: list, text=True, media=True, workers=None) -> list:
+    """
+    并发获取多条微博的全文（text）和视频地址（media）并填入缓存
+
+    只请求尚未缓存且需要另行请求的微博，相同 mblogid / 视频 fid 只请求一次；
+    其余微博直接以已有数据填入缓存。请求失败的微博不填入，之后访问属性时再单独请求。
+
+    return weibos
+    """
+    jobs = {}
+    for w in weibos:
+        if text and 'text' not in w.__dict__:
+            mblogid = w._longtext_id()
+            jobs.setdefault(('text', mblogid), []).append(w)
+        if media and 'media' not in w.__dict__:
+            video_id = w._video_id()
+            jobs.setdefault(('media', video_id), []).append(w)
+
+    fetch = {'text': WBapi.get_longtext, 'media': WBapi.get_video_urls}
+    fill = {'text': Weibo._with_longtext, 'media': Weibo._with_video}
+
+    pending = [job for job in jobs if job[1]]
+    futures = {}
+    if pending:
+        with ThreadPoolExecutor(min(workers or WBapi.page_workers, len(pending))) as executor:
+            futures = {job: executor.submit(fetch[job[0]], job[1]) for job in pending}
+    for job, same in jobs.items():
+        attr, key = job
+        value = None
+        if key:
+            e = futures[job].exception()
+            if e is not None:
+                logger.warning('resolve %s %s failed: %r', attr, key, e)
+                continue
+            value = futures[job].result()
+        for w in same:
+            w.__dict__[attr] = fill[attr](w, value)
+    return weibos
+
+
 class WeiboSpyder:
     """
-    need cookies to init
+    need cookies to init (a cookies string, or a list of them for an account pool)
+    store: (optional) Weibostore.WeiboStore，hotWeibos 和 search 获取到的微博自动写入
 
     methods:
     get_allGroups
@@ -211,9 +401,9 @@ class WeiboSpyder:
     search_Weibo
     """
 
-    def __init__(self, cookies: str) -> None:
-        WBapi.set_cookies(cookies)
-        WBapi.set_headers()
+    def __init__(self, cookies: 'str|list', store=None) -> None:
+        self.store = store
+        self.refresh_cookies(cookies)
 
     @property
     def allGroups(self):
@@ -251,22 +441,69 @@ class WeiboSpyder:
         """
         return WBapi.get_hotband()
 
-    def refresh_cookies(self,cookies:str):
-        WBapi.set_cookies(cookies)
-        WBapi.set_headers()
+    def refresh_cookies(self, cookies: 'str|list'):
+        """
+        cookies 为列表时启用多账号池（Weiboutils.set_accounts），请求在各账号间调度；
+        为字符串时停用已启用的账号池
+        """
+        if isinstance(cookies, str):
+            WBapi.clear_accounts()
+            WBapi.set_cookies(cookies)
+            WBapi.set_headers()
+        else:
+            WBapi.set_accounts(cookies)
 
-    def hotWeibos(self, title: str = '24小时榜', num=100):
+    def _stored(self, items, weibo_dict=None, batch_size=100):
+        """
+        设置了 store 时把产出的微博 dict 每 batch_size 条写入一次
+
+        weibo_dict: 从产出项中取出微博 dict 的函数，返回 None 时不写入；默认产出项即为微博 dict
+        """
+        if self.store is None:
+            yield from items
+            return
+        batch = []
+        try:
+            for item in items:
+                d = item if weibo_dict is None else weibo_dict(item)
+                if d is not None:
+                    batch.append(d)
+                if len(batch) >= batch_size:
+                    self.store.put_weibos(batch)
+                    batch = []
+                yield item
+        finally:
+            if batch:
+                self.store.put_weibos(batch)
+
+    @staticmethod
+    def _Weibo(weibo_dict: dict, compact=False, keep_raw=False) -> Weibo:
+        if compact:
+            return CompactWeibo(weibo_dict, keep_raw)
+        return Weibo(weibo_dict)
+
+    def hotWeibos(self, title: str = '24小时榜', num=100, compact=False, keep_raw=False):
         """
         获取不同类别或时段的热门微博
 
         title:from API get_allGroups
         num:MAX=400
+        compact: 为 True 时返回 CompactWeibo，只保留常用字段；
+                 keep_raw=True 时另外保留原始 dict
 
         return list of Weibo:
         """
-        return [Weibo(w) for w in WBapi.get_hotWeibos(title, num)]
+        return list(self.iter_hotWeibos(title, num, compact, keep_raw))
+
+    def iter_hotWeibos(self, title: str = '24小时榜', num=100, compact=False, keep_raw=False):
+        """
+        同 hotWeibos，但以生成器逐条产出 Weibo
+        """
+        for w in self._stored(WBapi.iter_hotWeibos(title, num)):
+            yield self._Weibo(w, compact, keep_raw)
 
-    def search(self, keyword: str, searchtype: str = 'weibo', num=10, **search_param):
+    def search(self, keyword: str, searchtype: str = 'weibo', num=10, compact=False, keep_raw=False,
+               **search_param):
         """
         搜索微博
 
@@ -278,13 +515,46 @@ class WeiboSpyder:
             video:(optional) xsort=hot(热门),typeall=1(全部),hasvideo=0|1
             weibo:(optional) nodup=1 //不加该参数结果为聚合重复微博
 
+        compact,keep_raw: 同 hotWeibos；user 类型时创建 compact 的 User
+
         return:list of searchtype
+            //user 类型返回的 User 尚未请求 info，可用 resolve_users 批量获取//
+        """
+        return list(self.iter_search(keyword, searchtype, num, compact, keep_raw, **search_param))
+
+    def iter_search(self, keyword: str, searchtype: str = 'weibo', num=10, compact=False, keep_raw=False,
+                    **search_param):
+        """
+        同 search，但以生成器逐条产出，每页到达后即解析
         """
-        tags = WBapi.search_Weibo_tags(
-            keyword, searchtype, num, **search_param)
+        items = WBapi.iter_search_Weibo(keyword, searchtype, num, **search_param)
+        if searchtype not in ('user', 'topic'):
+            items = self._stored(items)
+        for d in items:
+            yield self._search_item(d, searchtype, compact, keep_raw)
+
+    def iter_search_many(self, specs, compact=False, keep_raw=False, workers=None, dedupe=True):
+        """
+        并发执行多个搜索（Weiboutils.iter_search_many），按完成顺序产出
+
+        specs: 每项为 keyword、(keyword, searchtype, num, search_param) 或同名 key 的 dict
+        dedupe: 多个关键词搜到的同一条微博只产出一次
+
+        yield (spec, Weibo|User|dict)：spec 为 specs 中的原对象，结果类型同 search
+        """
+        specs = list(specs)
+        types = {id(spec): WBapi._search_spec(spec)[1] for spec in specs}
+
+        def weibo_dict(result):
+            spec, d = result
+            return None if types[id(spec)] in ('user', 'topic') else d
+
+        for spec, d in self._stored(WBapi.iter_search_many(specs, workers, dedupe), weibo_dict):
+            yield spec, self._search_item(d, types[id(spec)], compact, keep_raw)
+
+    def _search_item(self, d: dict, searchtype: str, compact=False, keep_raw=False):
         if searchtype == 'user':
-            return [User(u['url']) for u in [WBapi.parse_userortopic_tag(t, searchtype) for t in tags]]
-        elif searchtype == 'topic':
-            return [WBapi.parse_userortopic_tag(t, searchtype) for t in tags]
-        else:
-            return [Weibo(w) for w in [WBapi.parse_Weibo_tag(t) for t in tags]]
+            return User(d['url'], compact)
+        if searchtype == 'topic':
+            return d
+        return self._Weibo(d, compact, keep_raw)
@@ -0,0 +1,241 @@
+"""
+多账号 cookies 池
+
+每个 Account 持有自己的 cookies、连接池（Transport / AsyncTransport）、
+限速器和健康状态；AccountPool 按轮询或最少在途请求选择账号发送请求，
+并可直接作为全局传输对象使用：
+
+    Weiboutils.set_accounts([cookies1, cookies2, ...])
+
+账号被限流时进入冷却（时长按连续被限流次数指数增长），冷却期间不参与调度；
+检测到登录失效时永久移出轮换，直到调用 Account.revive 或重新 set_accounts。
+"""
+import itertools
+import threading
+import time
+from Weibotransport import (AsyncTransport, RateLimiter, Transport,
+                            logged_out, throttle_status)
+
+
+class Account:
+    """
+    一个账号
+
+    cookies: cookies 字符串，请求时作为 Cookie 头发送
+    name: (optional) 用于 stats 和日志的名称，默认由 AccountPool 按序号命名
+    rate,burst,rates: 该账号独用的限速器参数，含义同 Weibotransport.RateLimiter
+    pool_size: 该账号的连接数（同步和异步传输各一个连接池）
+    cooldown: 首次被限流后的冷却秒数，连续被限流时翻倍，至多 max_cooldown
+
+    attrs: in_flight,requests,throttles,logged_out,available_at
+    """
+
+    def __init__(self, cookies: str, name: str = None, rate=5.0, burst=10, rates: dict = None,
+                 pool_size=10, cooldown=60, max_cooldown=1800) -> None:
+        self.cookies = cookies
+        self.name = name
+        self.limiter = RateLimiter(rate, burst, rates)
+        self.pool_size = pool_size
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.in_flight = 0
+        self.requests = 0
+        self.throttles = 0
+        self.logged_out = False
+        self.available_at = 0.0
+        self._streak = 0
+        # 限流由 AccountPool 换账号处理，账号自身不退避重试
+        self.transport = Transport(
+            pool_size, throttle_retries=0, limiter=self.limiter)
+        self.async_transport = AsyncTransport(
+            pool_size, throttle_retries=0, limiter=self.limiter)
+
+    def usable(self, now: float) -> bool:
+        return not self.logged_out and self.available_at <= now
+
+    def throttled(self):
+        self.throttles += 1
+        self.available_at = time.monotonic() + min(
+            self.max_cooldown, self.cooldown * 2 ** self._streak)
+        self._streak += 1
+
+    def succeeded(self):
+        self._streak = 0
+
+    def revive(self, cookies: str = None):
+        """
+        换上新 cookies（可选）并重新加入轮换
+        """
+        if cookies is not None:
+            self.cookies = cookies
+        self.logged_out = False
+        self.available_at = 0.0
+        self._streak = 0
+
+    def headers(self, headers: dict = None) -> dict:
+        headers = dict(headers or {})
+        headers['Cookie'] = self.cookies
+        return headers
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            'name': self.name,
+            'state': 'logged_out' if self.logged_out else (
+                'cooling' if self.available_at > now else 'active'),
+            'in_flight': self.in_flight,
+            'requests': self.requests,
+            'throttles': self.throttles,
+            'cooldown': max(0.0, self.available_at - now)
+        }
+
+
+class AccountPool:
+    """
+    账号池，接口同 Weibotransport.Transport（request/get/post/close）
+
+    accounts: Account 或 cookies 字符串的序列
+    strategy: 'round_robin' 轮询，'least_loaded' 选在途请求最少的账号
+    retries: 被限流或登录失效时换账号重试的次数（重试不读写响应缓存）
+    max_wait: 没有可用账号时最多等待冷却结束的秒数，超过则抛出 RuntimeError
+    """
+
+    strategies = ('round_robin', 'least_loaded')
+
+    def __init__(self, accounts, strategy='round_robin', retries=6, max_wait=1800) -> None:
+        assert strategy in self.strategies
+        self.strategy = strategy
+        self.retries = retries
+        self.max_wait = max_wait
+        self.accounts = []
+        self._lock = threading.Lock()
+        self._counter = itertools.count()
+        for account in accounts:
+            self.add(account)
+
+    def add(self, account: 'Account|str') -> Account:
+        if not isinstance(account, Account):
+            account = Account(account)
+        with self._lock:
+            if account.name is None:
+                account.name = 'account%d' % len(self.accounts)
+            self.accounts.append(account)
+        return account
+
+    def remove(self, name: str):
+        with self._lock:
+            self.accounts = [a for a in self.accounts if a.name != name]
+
+    def stats(self) -> list:
+        return [a.stats() for a in self.accounts]
+
+    def _acquire(self) -> 'tuple[Account|None, float]':
+        """
+        选出一个账号并计入在途请求；没有可用账号时返回 (None, 最早恢复前的等待秒数)
+        """
+        with self._lock:
+            now = time.monotonic()
+            usable = [a for a in self.accounts if a.usable(now)]
+            if not usable:
+                cooling = [a.available_at for a in self.accounts if not a.logged_out]
+                if not cooling:
+                    raise RuntimeError('all accounts are logged out')
+                return None, min(cooling) - now
+            if self.strategy == 'least_loaded':
+                account = min(usable, key=lambda a: a.in_flight)
+            else:
+                account = usable[next(self._counter) % len(usable)]
+            account.in_flight += 1
+            account.requests += 1
+            return account, 0.0
+
+    def _release(self, account: Account, r) -> bool:
+        """
+        记录响应对账号健康状态的影响，return 是否应换账号重试
+        """
+        with self._lock:
+            account.in_flight -= 1
+            if r is None:
+                return False
+            if r.status_code in throttle_status:
+                account.throttled()
+                return True
+            if logged_out(r):
+                account.logged_out = True
+                return True
+            account.succeeded()
+            return False
+
+    def _wait_time(self, waited: float, wait: float) -> float:
+        if waited + wait > self.max_wait:
+            raise RuntimeError(
+                'no account available within %d seconds' % self.max_wait)
+        return wait
+
+    def request(self, method: str, url: str, headers: dict = None, **kwargs):
+        attempt = 0
+        waited = 0.0
+        while True:
+            account, wait = self._acquire()
+            if account is None:
+                wait = self._wait_time(waited, wait)
+                time.sleep(wait)
+                waited += wait
+                continue
+            r = None
+            try:
+                r = account.transport.request(
+                    method, url, headers=account.headers(headers), use_cache=attempt == 0, **kwargs)
+            finally:
+                retry = self._release(account, r)
+            if not retry or attempt == self.retries:
+                return r
+            attempt += 1
+
+    def get(self, url: str, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def close(self):
+        for account in self.accounts:
+            account.transport.close()
+
+
+class AsyncAccountPool(AccountPool):
+    """
+    AccountPool 的异步版本，接口同 Weibotransport.AsyncTransport
+    """
+
+    async def request(self, method: str, url: str, headers: dict = None, **kwargs):
+        import asyncio
+
+        attempt = 0
+        waited = 0.0
+        while True:
+            account, wait = self._acquire()
+            if account is None:
+                wait = self._wait_time(waited, wait)
+                await asyncio.sleep(wait)
+                waited += wait
+                continue
+            r = None
+            try:
+                r = await account.async_transport.request(
+                    method, url, headers=account.headers(headers), use_cache=attempt == 0, **kwargs)
+            finally:
+                retry = self._release(account, r)
+            if not retry or attempt == self.retries:
+                return r
+            attempt += 1
+
+    async def get(self, url: str, **kwargs):
+        return await self.request('GET', url, **kwargs)
+
+    async def post(self, url: str, **kwargs):
+        return await self.request('POST', url, **kwargs)
+
+    async def close(self):
+        for account in self.accounts:
+            await account.async_transport.close()
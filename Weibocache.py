@@ -0,0 +1,111 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlencode
+
+
+class ResponseCache:
+    """
+    进程内响应缓存，按接口和参数缓存有效响应（见 Weibotransport._cacheable）的 body
+
+    key 不含 cookies：缓存的接口返回的是公开内容，多个账号共享同一条目
+
+    ttls: {url 片段: 秒数}，只缓存 url 中包含某个片段的 GET 请求
+    maxsize: 内存中最多保留的条目数，超出时淘汰最久未使用的条目（LRU）
+    path: (optional) SQLite 文件路径，作为内存之外的持久层，进程重启后仍可命中
+
+    attrs: hits,misses
+    """
+
+    default_ttls = {
+        'profile/info': 600,
+        'feed/allGroups': 3600,
+        'statuses/longtext': 86400,
+        'statuses/show': 600,
+    }
+
+    def __init__(self, maxsize=10000, ttls: dict = None, path: str = None) -> None:
+        self.maxsize = maxsize
+        self.ttls = dict(self.default_ttls if ttls is None else ttls)
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, expires REAL, content BLOB)')
+            self._db.commit()
+
+    def ttl_for(self, url: str) -> 'int|None':
+        for fragment, ttl in self.ttls.items():
+            if fragment in url:
+                return ttl
+        return None
+
+    @staticmethod
+    def key(method: str, url: str, params: dict = None) -> str:
+        if params:
+            url = url + '?' + urlencode(sorted((k, str(v))
+                                        for k, v in params.items()))
+        return method.upper() + ' ' + url
+
+    def get(self, key: str) -> 'bytes|None':
+        now = time.time()
+        with self._lock:
+            item = self._items.get(key)
+            if item is None and self._db is not None:
+                row = self._db.execute(
+                    'SELECT expires, content FROM responses WHERE key = ?', (key,)).fetchone()
+                if row:
+                    item = row
+                    self._store(key, item)
+            if item is None or item[0] < now:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key: str, content: bytes, ttl: int):
+        item = (time.time() + ttl, content)
+        with self._lock:
+            self._store(key, item)
+            if self._db is not None:
+                self._db.execute(
+                    'INSERT OR REPLACE INTO responses VALUES (?, ?, ?)', (key, item[0], item[1]))
+                self._db.commit()
+
+    def _store(self, key, item):
+        self._items[key] = item
+        self._items.move_to_end(key)
+        while len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._items.pop(key, None)
+            if self._db is not None:
+                self._db.execute('DELETE FROM responses WHERE key = ?', (key,))
+                self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            if self._db is not None:
+                self._db.execute('DELETE FROM responses')
+                self._db.commit()
+
+    def stats(self) -> dict:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._items)
+        }
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
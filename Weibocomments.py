@@ -0,0 +1,124 @@
+import json
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import Weiboutils as WBapi
+
+
+class CommentCrawler:
+    """
+    全量评论爬取
+
+    沿 max_id 游标获取每条微博的全部评论，多条微博在线程池中并发爬取，
+    请求仍经过 Weiboutils 的共享传输层和限速器。
+
+    checkpoint: (optional) JSON 文件路径，每获取一页即记录该微博的游标，
+                中断后用同一文件重新 crawl 会从记录的游标处继续，已完成的微博被跳过
+    replies: 为 True 时同时获取二级评论，放在 comment['replies']
+    workers: 同时爬取的微博数
+    """
+
+    _done = -1
+
+    def __init__(self, checkpoint: str = None, replies=False, workers=None) -> None:
+        self.checkpoint = checkpoint
+        self.replies = replies
+        self.workers = workers or WBapi.page_workers
+        self._lock = threading.Lock()
+        self._cursors = {}
+        if checkpoint and os.path.exists(checkpoint):
+            with open(checkpoint, 'r') as fp:
+                self._cursors = json.load(fp)
+
+    def cursor(self, mid) -> 'int|None':
+        """
+        return 已记录的 max_id；未开始为 0，已完成为 None
+        """
+        max_id = self._cursors.get(str(mid), 0)
+        return None if max_id == self._done else max_id
+
+    def _save(self, mid, max_id):
+        with self._lock:
+            self._cursors[str(mid)] = max_id
+            if self.checkpoint:
+                tmp = self.checkpoint + '.tmp'
+                with open(tmp, 'w') as fp:
+                    json.dump(self._cursors, fp)
+                os.replace(tmp, self.checkpoint)
+
+    def _iter_pages(self, uid, mid, stop: threading.Event = None):
+        """
+        yield (一页评论, 该页之后应记录的游标)
+        """
+        max_id = self.cursor(mid)
+        if max_id is None:
+            return
+        while stop is None or not stop.is_set():
+            comments, next_max_id = WBapi.get_comment_page(uid, mid, max_id)
+            if self.replies:
+                for c in comments:
+                    c['replies'] = list(WBapi.iter_replies(
+                        uid, c['id'])) if c.get('total_number') else []
+            if not next_max_id or not comments:
+                yield comments, self._done
+                return
+            yield comments, next_max_id
+            max_id = next_max_id
+
+    def iter_comments(self, uid, mid):
+        """
+        获取一条微博的评论，从 checkpoint 记录的游标处开始；
+        每页产出完毕后才记录游标，中断时未处理完的页在恢复后重新获取
+
+        yield json-like dict
+        """
+        for comments, max_id in self._iter_pages(uid, mid):
+            yield from comments
+            self._save(mid, max_id)
+
+    def crawl(self, posts):
+        """
+        并发爬取多条微博的评论，按页到达顺序产出；游标在该页产出完毕后记录
+
+        posts: (uid, mid) 序列
+        yield (mid, json-like dict)
+        """
+        posts = list(posts)
+        results = queue.Queue(maxsize=self.workers * 4)
+        stop = threading.Event()
+        finished = object()
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    results.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    pass
+
+        def run(post):
+            uid, mid = post
+            try:
+                for comments, max_id in self._iter_pages(uid, mid, stop):
+                    put((mid, comments, max_id))
+            finally:
+                put(finished)
+
+        with ThreadPoolExecutor(self.workers) as executor:
+            futures = [executor.submit(run, post) for post in posts]
+            try:
+                remaining = len(posts)
+                while remaining:
+                    item = results.get()
+                    if item is finished:
+                        remaining -= 1
+                        continue
+                    mid, comments, max_id = item
+                    for c in comments:
+                        yield mid, c
+                    self._save(mid, max_id)
+                for future in futures:
+                    future.result()
+            finally:
+                stop.set()
@@ -0,0 +1,249 @@
+"""
+列式批量导出（需要 pyarrow）
+
+把 Weibo、User、评论逐条转换为有类型的列，每 chunk_size 行组成一个 Arrow RecordBatch
+写入 Parquet 或 Feather（Arrow IPC）文件；输入可以是生成器，内存占用只与 chunk_size 有关。
+
+    export_Weibo(spyder.iter_hotWeibos(num=400), 'hot.parquet')
+    export_users(WBapi.iter_user_follow(uid, 1), 'fans.feather')
+    export_comments(CommentCrawler().crawl(posts), 'comments.parquet')
+"""
+import datetime as dt
+import html
+import re
+import Weiboutils as WBapi
+from WeiboSpyder import CompactWeibo, User, Weibo, resolve_media
+from Weiborecords import WeiboRecord
+
+
+def _pa():
+    import pyarrow
+    return pyarrow
+
+
+def weibo_schema():
+    pa = _pa()
+    return pa.schema([
+        ('mid', pa.string()),
+        ('uid', pa.int64()),
+        ('user_name', pa.string()),
+        ('created_at', pa.timestamp('s', tz='Asia/Shanghai')),
+        ('created_text', pa.string()),
+        ('text', pa.string()),
+        ('forward', pa.int64()),
+        ('comment', pa.int64()),
+        ('like', pa.int64()),
+        ('images', pa.list_(pa.string())),
+        ('video', pa.string()),
+        ('retweet', pa.string()),
+    ])
+
+
+def user_schema():
+    pa = _pa()
+    return pa.schema([
+        ('id', pa.int64()),
+        ('screen_name', pa.string()),
+        ('profile_url', pa.string()),
+        ('followers_count', pa.int64()),
+        ('friends_count', pa.int64()),
+    ])
+
+
+def comment_schema():
+    pa = _pa()
+    return pa.schema([
+        ('id', pa.int64()),
+        ('mid', pa.string()),
+        ('uid', pa.int64()),
+        ('name', pa.string()),
+        ('created_at', pa.timestamp('s', tz='Asia/Shanghai')),
+        ('text', pa.string()),
+        ('text_raw', pa.string()),
+        ('like_counts', pa.int64()),
+        ('total_number', pa.int64()),
+    ])
+
+
+def _count(value) -> 'int|None':
+    """
+    '123'、'1.2万'、'100万+' 之类的计数转为整数，无法识别时为 None
+    """
+    if isinstance(value, int):
+        return value
+    m = re.match(r'\s*([\d.]+)\s*(万|亿)?', str(value))
+    if not m:
+        return None
+    scale = {'万': 10 ** 4, '亿': 10 ** 8}.get(m.group(2), 1)
+    return int(float(m.group(1)) * scale)
+
+
+def _time(created_at: 'str|None') -> 'dt.datetime|None':
+    try:
+        return dt.datetime.strptime(created_at, WBapi.time_pat)
+    except (TypeError, ValueError):
+        return None
+
+
+def _plain(text: str) -> str:
+    """
+    去掉全文（longTextContent）中的 html 标签，<br> 换为换行
+    """
+    text = re.sub(r'<br\s*/?>', '\n', text)
+    return html.unescape(re.sub(r'<[^>]+>', '', text))
+
+
+def _weibo_text(weibo: Weibo, record: WeiboRecord, deep: bool) -> str:
+    """
+    deep 且获取了全文时为全文的纯文本，否则为已有的（可能被折叠的）text
+    """
+    if deep and weibo._longtext_id():
+        return _plain(weibo.text['raw'])
+    return record.text
+
+
+def _weibo_row(weibo: 'Weibo|dict', deep=False) -> dict:
+    if not isinstance(weibo, Weibo):
+        weibo = CompactWeibo(weibo)
+    r = weibo.record if isinstance(weibo, CompactWeibo) else WeiboRecord.from_dict(weibo.raw)
+    video = (weibo.media if deep else weibo._media())['video']
+    if isinstance(video, dict):
+        video = video.get('src') or next(iter(video.values()), None)
+    return {
+        'mid': r.mid,
+        'uid': int(r.uid),
+        'user_name': r.user_name,
+        'created_at': _time(r.created_at),
+        'created_text': r.created_at,
+        'text': _weibo_text(weibo, r, deep),
+        'forward': _count(r.forward),
+        'comment': _count(r.comment),
+        'like': _count(r.like),
+        'images': list(r.images or ()),
+        'video': video or None,
+        'retweet': r.retweet_id,
+    }
+
+
+def _user_row(user: 'User|dict') -> dict:
+    info = user.shortinfo if isinstance(user, User) else user
+    return {k: info.get(k) for k in User.shortinfo_keys}
+
+
+def _comment_row(comment: 'dict|tuple') -> dict:
+    """
+    comment: 评论接口返回的 dict，或 CommentCrawler.crawl 产出的 (mid, dict)
+    """
+    mid = None
+    if isinstance(comment, tuple):
+        mid, comment = comment
+    user = comment.get('user') or {}
+    return {
+        'id': comment['id'],
+        'mid': None if mid is None else str(mid),
+        'uid': user.get('id'),
+        'name': user.get('screen_name') or user.get('name'),
+        'created_at': _time(comment.get('created_at')),
+        'text': comment.get('text'),
+        'text_raw': comment.get('text_raw'),
+        'like_counts': comment.get('like_counts'),
+        'total_number': comment.get('total_number'),
+    }
+
+
+def _resolved(weibos, chunk_size: int):
+    """
+    每 chunk_size 条微博用 resolve_media 并发获取一次全文和视频地址
+    """
+    chunk = []
+    for w in weibos:
+        chunk.append(w)
+        if len(chunk) >= chunk_size:
+            yield from resolve_media(chunk)
+            chunk = []
+    yield from resolve_media(chunk)
+
+
+def record_batches(rows, schema, chunk_size=10000):
+    """
+    把逐行的 dict 按 chunk_size 行一批转换为 RecordBatch
+
+    yield pyarrow.RecordBatch
+    """
+    pa = _pa()
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield pa.RecordBatch.from_pylist(chunk, schema=schema)
+            chunk = []
+    if chunk:
+        yield pa.RecordBatch.from_pylist(chunk, schema=schema)
+
+
+def write_batches(batches, path: str, schema, format: str = None, compression='zstd') -> int:
+    """
+    把 RecordBatch 逐批写入文件
+
+    format: 'parquet' | 'feather'，默认按扩展名判断（.parquet 之外均为 feather）
+    return 写入的行数
+    """
+    pa = _pa()
+    if format is None:
+        format = 'parquet' if path.endswith('.parquet') else 'feather'
+    assert format in ('parquet', 'feather')
+    rows = 0
+    if format == 'parquet':
+        import pyarrow.parquet as pq
+        with pq.ParquetWriter(path, schema, compression=compression) as writer:
+            for batch in batches:
+                writer.write_batch(batch)
+                rows += batch.num_rows
+    else:
+        options = pa.ipc.IpcWriteOptions(compression=compression)
+        with pa.ipc.new_file(path, schema, options=options) as writer:
+            for batch in batches:
+                writer.write_batch(batch)
+                rows += batch.num_rows
+    return rows
+
+
+def export_Weibo(weibos, path: str, format: str = None, chunk_size=10000, deep=False) -> int:
+    """
+    导出微博：mid,uid,user_name,created_at,created_text,text,forward,comment,like,images,video,retweet
+
+    weibos: Weibo、CompactWeibo 或 Weiboutils 返回的微博 dict 的可迭代对象
+    deep: 为 True 时取 Weibo.text / Weibo.media（每 chunk_size 条用 resolve_media
+          并发请求全文和视频地址），被折叠微博的 text 为全文，否则只用已有数据
+    return 写入的行数
+    """
+    schema = weibo_schema()
+    weibos = (w if isinstance(w, Weibo) else CompactWeibo(w) for w in weibos)
+    if deep:
+        weibos = _resolved(weibos, chunk_size)
+    rows = (_weibo_row(w, deep) for w in weibos)
+    return write_batches(record_batches(rows, schema, chunk_size), path, schema, format)
+
+
+def export_users(users, path: str, format: str = None, chunk_size=10000) -> int:
+    """
+    导出用户 shortinfo：id,screen_name,profile_url,followers_count,friends_count
+
+    users: User（未获取 info 时会请求）或用户 dict 的可迭代对象
+    return 写入的行数
+    """
+    schema = user_schema()
+    rows = (_user_row(u) for u in users)
+    return write_batches(record_batches(rows, schema, chunk_size), path, schema, format)
+
+
+def export_comments(comments, path: str, format: str = None, chunk_size=10000) -> int:
+    """
+    导出评论：id,mid,uid,name,created_at,text,text_raw,like_counts,total_number
+
+    comments: 评论 dict 或 (mid, dict) 的可迭代对象
+    return 写入的行数
+    """
+    schema = comment_schema()
+    rows = (_comment_row(c) for c in comments)
+    return write_batches(record_batches(rows, schema, chunk_size), path, schema, format)
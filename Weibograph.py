@@ -0,0 +1,174 @@
+"""
+关注关系图的广度优先爬取
+
+从种子 uid 出发，逐层获取粉丝和/或关注（Weiboutils.iter_user_follow），
+每层的用户在线程池中并发获取，边逐条写入磁盘上的边表（TSV，每行 follower\\tfollowee）。
+已发现的 uid 记录在 UidSet 中（排好序的 int64 数组 + 小缓冲集合，每个 uid 约 8~16 字节），
+内存占用只与已发现的用户数有关，与边数无关。
+
+    crawler = GraphCrawler(relation='fans', depth=2, num=200)
+    stats = crawler.crawl([1669879400], 'edges.tsv')
+"""
+import logging
+from array import array
+from bisect import bisect_left
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import Weiboutils as WBapi
+
+logger = logging.getLogger(__name__)
+
+
+class UidSet:
+    """
+    紧凑的 uid 集合，只支持 add 和 in
+
+    新 uid 先放入缓冲集合，缓冲超过已排序部分的 1/8（至少 65536 个）时合并进排好序的 array('q')，
+    查询时在两者中查找。
+    """
+
+    def __init__(self, uids=()) -> None:
+        self._sorted = array('q')
+        self._buffer = set()
+        for uid in uids:
+            self.add(uid)
+
+    def __contains__(self, uid) -> bool:
+        uid = int(uid)
+        if uid in self._buffer:
+            return True
+        i = bisect_left(self._sorted, uid)
+        return i < len(self._sorted) and self._sorted[i] == uid
+
+    def add(self, uid) -> bool:
+        """
+        return 是否为新 uid
+        """
+        uid = int(uid)
+        if uid in self:
+            return False
+        self._buffer.add(uid)
+        if len(self._buffer) > max(65536, len(self._sorted) // 8):
+            self._merge()
+        return True
+
+    def _merge(self):
+        # 按插入点分段复制已排序部分，不把整个数组转为 int 对象列表
+        merged = array('q')
+        start = 0
+        for uid in sorted(self._buffer):
+            i = bisect_left(self._sorted, uid, start)
+            merged.extend(self._sorted[start:i])
+            merged.append(uid)
+            start = i
+        merged.extend(self._sorted[start:])
+        self._sorted = merged
+        self._buffer = set()
+
+    def __len__(self) -> int:
+        return len(self._sorted) + len(self._buffer)
+
+
+class GraphCrawler:
+    """
+    relation: 'fans' 获取粉丝 | 'follows' 获取关注 | 'both' 两者都获取
+    depth: 展开的层数，种子为第 0 层；depth=1 只获取种子的粉丝/关注
+    num: 每个用户每种关系最多获取的人数，None 为获取全部（受微博接口上限约束）
+    workers: 同时获取的用户数
+    max_users: 最多展开的用户数，None 为不限
+    """
+
+    relations = {'fans': (1,), 'follows': (0,), 'both': (1, 0)}
+
+    def __init__(self, relation='fans', depth=1, num=200, workers=None, max_users=None) -> None:
+        assert relation in self.relations
+        self.flags = self.relations[relation]
+        self.depth = depth
+        self.num = num
+        self.workers = workers or WBapi.page_workers
+        self.max_users = max_users
+
+    def neighbors(self, uid: int) -> list:
+        """
+        return [(flag, [邻居 uid])]；翻页期间名单变动造成的重复已去除
+        """
+        return [(flag, list(dict.fromkeys(
+            u.id for u in WBapi.iter_user_follow(uid, flag, self.num, compact=True) if u.id != uid)))
+            for flag in self.flags]
+
+    def crawl(self, seeds, path: str) -> dict:
+        """
+        从 seeds 出发逐层爬取，把边追加写入 path
+
+        return dict: users 已展开的用户数,discovered 已发现的用户数,edges 写入的边数,
+                     failed 获取失败的用户数,levels 每层展开的用户数
+        """
+        seen = UidSet()
+        expanded = UidSet()
+        frontier = array('q')
+        for uid in seeds:
+            if seen.add(uid):
+                frontier.append(int(uid))
+        stats = {'users': 0, 'discovered': len(seen), 'edges': 0, 'failed': 0, 'levels': []}
+        with open(path, 'a', encoding='utf-8') as fp:
+            for _ in range(self.depth):
+                if not frontier or self._exhausted(stats):
+                    break
+                next_frontier = array('q')
+                expanded_before = stats['users']
+                for uid, result in self._fetch(frontier, stats):
+                    if result is None:
+                        stats['failed'] += 1
+                        continue
+                    stats['users'] += 1
+                    for flag, uids in result:
+                        for other in uids:
+                            # relation='both' 时同一条边可能从两端各获取一次，只写先获取到的一端
+                            if len(self.flags) == 1 or other not in expanded:
+                                fp.write('%d\t%d\n' % ((other, uid) if flag else (uid, other)))
+                                stats['edges'] += 1
+                            if seen.add(other):
+                                next_frontier.append(other)
+                    expanded.add(uid)
+                stats['levels'].append(stats['users'] - expanded_before)
+                stats['discovered'] = len(seen)
+                fp.flush()
+                frontier = next_frontier
+        return stats
+
+    def _exhausted(self, stats: dict) -> bool:
+        return self.max_users is not None and stats['users'] >= self.max_users
+
+    def _fetch(self, frontier: array, stats: dict):
+        """
+        并发获取一层用户的邻居，保持至多 workers * 2 个待完成的请求，按完成顺序产出
+
+        yield (uid, neighbors() 的结果，失败时为 None)
+        """
+        uids = iter(frontier)
+        executor = ThreadPoolExecutor(self.workers)
+        pending = {}
+
+        def submit(n):
+            for _ in range(n):
+                if self.max_users is not None and stats['users'] + len(pending) >= self.max_users:
+                    return
+                uid = next(uids, None)
+                if uid is None:
+                    return
+                pending[executor.submit(self.neighbors, uid)] = uid
+
+        try:
+            submit(self.workers * 2)
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    uid = pending.pop(future)
+                    e = future.exception()
+                    if e is not None:
+                        logger.warning('get neighbors of %s failed: %r', uid, e)
+                    yield uid, None if e is not None else future.result()
+                submit(self.workers * 2 - len(pending))
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
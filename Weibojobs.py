@@ -0,0 +1,312 @@
+"""
+持久化爬取任务队列与多进程 worker
+
+任务存放在 SQLite 文件中，多个 worker 进程（也可以在共享该文件的多台机器上）
+并发领取执行，结果写回同一文件的 results 表。
+
+    q = JobQueue('crawl.db')
+    q.put('hot', title='24小时榜', num=100, follow={'comments': {}, 'user': {}})
+    q.put('search', keyword='天气', num=50)
+    run_workers('crawl.db', processes=4, cookies=cookies)
+    for kind, args, item in q.results('comments'):
+        ...
+
+任务类型及参数见 handlers：
+    hot: title,num                      热门微博
+    search: keyword,searchtype,num,params
+    fans / follows: uid,num
+    comments: uid,mid,num
+    user: uid（或用户主页 url）
+    user_weibo: uid,pages
+
+follow: {子任务类型: 子任务的其余参数} 描述扇出，子任务的 uid/mid 取自父任务的结果，
+其余参数中的 follow 继续向下扇出，如 hot → 评论、作者 → 作者微博 可写作
+    follow={'comments': {'num': 100}, 'user': {'follow': {'user_weibo': {'pages': 1}}}}
+同类型、同参数（不含 follow）的任务只入队一次；失败的任务按指数退避重试，
+超过 max_attempts 次标记为 failed；worker 异常退出时，租约到期后任务被重新领取。
+"""
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import time
+from itertools import islice
+import Weiboutils as WBapi
+
+
+def _hot(args):
+    items = list(WBapi.iter_hotWeibos(args.get('title', '24小时榜'), args.get('num', 100)))
+    return items, [{'uid': _uid(w['user']['id']), 'mid': int(w['id'])} for w in items]
+
+
+def _search(args):
+    searchtype = args.get('searchtype', 'weibo')
+    items = list(WBapi.iter_search_Weibo(
+        args['keyword'], searchtype, args.get('num', 10), **args.get('params', {})))
+    if searchtype == 'topic':
+        return items, []
+    if searchtype == 'user':
+        return items, [{'uid': _uid(d['url'])} for d in items]
+    return items, [{'uid': _uid(d['act']['comment']['uid']), 'mid': int(d['act']['comment']['mid'])} for d in items]
+
+
+def _follow(flag):
+    def handler(args):
+        items = list(WBapi.iter_user_follow(_uid(args['uid']), flag, args.get('num')))
+        return items, [{'uid': u['id']} for u in items]
+    return handler
+
+
+def _comments(args):
+    items = list(islice(WBapi.iter_comments(args['uid'], args['mid']), args.get('num')))
+    return items, [{'uid': c['user']['id']} for c in items]
+
+
+def _user(args):
+    uid = _uid(args['uid'])
+    return [WBapi.get_user_info(uid)['data']['user']], [{'uid': uid}]
+
+
+def _user_weibo(args):
+    items = list(WBapi.iter_user_weibo(_uid(args['uid']), args.get('pages', 3)))
+    return items, [{'uid': _uid(w['user']['id']), 'mid': int(w['id'])} for w in items]
+
+
+def _uid(arg) -> int:
+    """
+    uid 或用户主页 url --> int uid，使同一用户的任务参数一致（入队时按参数去重）；
+    扇出引用中的 mid 同样统一为 int
+    """
+    try:
+        return int(arg)
+    except (TypeError, ValueError):
+        return int(WBapi.get_uid_from_url(arg))
+
+
+# 任务类型 --> handler(args) -> (结果列表, 供扇出的引用列表 [{uid[,mid]}])
+handlers = {
+    'hot': _hot,
+    'search': _search,
+    'fans': _follow(1),
+    'follows': _follow(0),
+    'comments': _comments,
+    'user': _user,
+    'user_weibo': _user_weibo,
+}
+
+# 子任务类型 --> 其所需的引用字段
+_child_fields = {
+    'comments': ('uid', 'mid'),
+    'user': ('uid',),
+    'fans': ('uid',),
+    'follows': ('uid',),
+    'user_weibo': ('uid',),
+}
+
+
+def _check_follow(follow: dict):
+    for kind, spec in follow.items():
+        assert kind in _child_fields, 'cannot fan out to %r' % kind
+        _check_follow(spec.get('follow') or {})
+
+
+def _children(follow: dict, refs: list) -> list:
+    children = []
+    for kind, spec in follow.items():
+        fields = _child_fields[kind]
+        for ref in refs:
+            if all(ref.get(f) is not None for f in fields):
+                args = {f: ref[f] for f in fields}
+                args.update(spec)
+                children.append((kind, args))
+    return children
+
+
+def run_job(job: dict) -> tuple:
+    """
+    执行一个任务
+
+    return (结果列表, 子任务列表 [(kind, args)])
+    """
+    items, refs = handlers[job['kind']](job['args'])
+    return items, _children(job['args'].get('follow') or {}, refs)
+
+
+class JobQueue:
+    """
+    SQLite 任务队列，每个进程各自打开一个 JobQueue
+
+    path: SQLite 文件路径
+    max_attempts: 每个任务最多执行的次数
+    retry_delay: 第一次失败后的重试间隔秒数，之后每次翻倍
+    """
+
+    def __init__(self, path: str, max_attempts=3, retry_delay=30) -> None:
+        self.path = path
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._db = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('''CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY, kind TEXT, args TEXT, key TEXT UNIQUE, parent INTEGER,
+            state TEXT, attempts INTEGER DEFAULT 0, not_before REAL DEFAULT 0,
+            lease_until REAL DEFAULT 0, worker TEXT, error TEXT, updated REAL)''')
+        self._db.execute(
+            'CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, not_before)')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS results (job_id INTEGER, kind TEXT, data TEXT)')
+
+    @staticmethod
+    def key(kind: str, args: dict) -> str:
+        return kind + ' ' + json.dumps({k: v for k, v in args.items() if k != 'follow'},
+                                       sort_keys=True, ensure_ascii=False)
+
+    def put(self, kind: str, parent: int = None, **args) -> 'int|None':
+        """
+        入队一个任务，return 任务 id；相同任务已存在时返回 None
+        """
+        assert kind in handlers
+        _check_follow(args.get('follow') or {})
+        cur = self._db.execute(
+            "INSERT OR IGNORE INTO jobs (kind, args, key, parent, state, updated) VALUES (?, ?, ?, ?, 'pending', ?)",
+            (kind, json.dumps(args, ensure_ascii=False), self.key(kind, args), parent, time.time()))
+        return cur.lastrowid if cur.rowcount else None
+
+    def claim(self, worker: str, lease=600) -> 'dict|None':
+        """
+        领取一个可执行的任务（待执行且已过退避时间，或租约已过期），没有时返回 None
+
+        return dict: id,kind,args,attempts
+        """
+        now = time.time()
+        self._db.execute('BEGIN IMMEDIATE')
+        try:
+            row = self._db.execute(
+                "SELECT id, kind, args, attempts FROM jobs WHERE (state = 'pending' AND not_before <= ?)"
+                " OR (state = 'running' AND lease_until < ?) ORDER BY id LIMIT 1", (now, now)).fetchone()
+            if row is not None:
+                self._db.execute(
+                    "UPDATE jobs SET state = 'running', attempts = attempts + 1, lease_until = ?, worker = ?, updated = ?"
+                    " WHERE id = ?", (now + lease, worker, now, row[0]))
+            self._db.execute('COMMIT')
+        except BaseException:
+            self._db.execute('ROLLBACK')
+            raise
+        if row is None:
+            return None
+        return {'id': row[0], 'kind': row[1], 'args': json.loads(row[2]), 'attempts': row[3] + 1, 'worker': worker}
+
+    def complete(self, job: dict, items: list, children: list = ()) -> bool:
+        """
+        在同一事务中写入结果、入队子任务并标记任务完成
+
+        return 是否写入；租约已过期且任务已被其他 worker 领取时不写入，返回 False
+        """
+        self._db.execute('BEGIN IMMEDIATE')
+        try:
+            held = self._db.execute(
+                "UPDATE jobs SET state = 'done', error = NULL, updated = ?"
+                " WHERE id = ? AND worker = ? AND state = 'running'",
+                (time.time(), job['id'], job['worker'])).rowcount
+            if held:
+                self._db.executemany('INSERT INTO results VALUES (?, ?, ?)', [
+                    (job['id'], job['kind'], json.dumps(item, ensure_ascii=False)) for item in items])
+                for kind, args in children:
+                    self.put(kind, job['id'], **args)
+            self._db.execute('COMMIT')
+        except BaseException:
+            self._db.execute('ROLLBACK')
+            raise
+        return bool(held)
+
+    def fail(self, job: dict, error: str) -> bool:
+        """
+        return 是否记录；同 complete，不再持有租约时返回 False
+        """
+        now = time.time()
+        held = " WHERE id = ? AND worker = ? AND state = 'running'"
+        if job['attempts'] >= self.max_attempts:
+            cur = self._db.execute(
+                "UPDATE jobs SET state = 'failed', error = ?, updated = ?" + held,
+                (error, now, job['id'], job['worker']))
+        else:
+            cur = self._db.execute(
+                "UPDATE jobs SET state = 'pending', error = ?, not_before = ?, updated = ?" + held,
+                (error, now + self.retry_delay * 2 ** (job['attempts'] - 1), now, job['id'], job['worker']))
+        return bool(cur.rowcount)
+
+    def retry_failed(self) -> int:
+        """
+        把 failed 任务重置为待执行，return 重置的个数
+        """
+        return self._db.execute(
+            "UPDATE jobs SET state = 'pending', attempts = 0, not_before = 0 WHERE state = 'failed'").rowcount
+
+    def idle(self) -> bool:
+        """
+        没有待执行或执行中的任务
+        """
+        return self._db.execute(
+            "SELECT 1 FROM jobs WHERE state IN ('pending', 'running') LIMIT 1").fetchone() is None
+
+    def stats(self) -> dict:
+        return dict(self._db.execute('SELECT state, COUNT(*) FROM jobs GROUP BY state').fetchall())
+
+    def results(self, kind: str = None):
+        """
+        yield (任务类型, 任务参数, 结果 json-like dict)
+        """
+        sql = 'SELECT jobs.kind, jobs.args, results.data FROM results JOIN jobs ON jobs.id = results.job_id'
+        rows = self._db.execute(sql + ' WHERE jobs.kind = ?', (kind,)) if kind else self._db.execute(sql)
+        for kind, args, data in rows:
+            yield kind, json.loads(args), json.loads(data)
+
+    def close(self):
+        self._db.close()
+
+
+def work(path: str, cookies: 'str|list' = None, idle_exit=True, poll=1.0, lease=600, **queue_param):
+    """
+    worker 主循环：领取任务、执行、写回结果或记录失败
+
+    cookies: 同 WeiboSpyder 的参数，只在本进程内存中生效，不写 cookies 文件
+             （多个 worker 同时启动时不会互相截断）；为 None 时沿用 Weiboutils.cookies_path 中的 cookies
+    idle_exit: 为 True 时队列中没有待执行和执行中的任务即退出，否则一直轮询
+    """
+    if isinstance(cookies, str):
+        WBapi.get_headers()['Cookie'] = cookies
+    elif cookies is not None:
+        WBapi.set_accounts(cookies)
+    elif os.path.exists(WBapi.cookies_path):
+        WBapi.set_headers()
+    queue = JobQueue(path, **queue_param)
+    worker = '%s:%d' % (socket.gethostname(), os.getpid())
+    try:
+        while True:
+            job = queue.claim(worker, lease)
+            if job is None:
+                if idle_exit and queue.idle():
+                    return
+                time.sleep(poll)
+                continue
+            try:
+                items, children = run_job(job)
+            except Exception as e:
+                queue.fail(job, repr(e))
+                continue
+            queue.complete(job, items, children)
+    finally:
+        queue.close()
+
+
+def run_workers(path: str, processes: int = None, cookies: 'str|list' = None, idle_exit=True, **work_param):
+    """
+    启动 processes 个 worker 进程（默认为 CPU 数）消费队列，等待全部退出
+    """
+    workers = [multiprocessing.Process(target=work, args=(path, cookies, idle_exit), kwargs=work_param)
+               for _ in range(processes or os.cpu_count())]
+    for p in workers:
+        p.start()
+    for p in workers:
+        p.join()
@@ -0,0 +1,267 @@
+"""
+请求级埋点与指标
+
+Transport / AsyncTransport 每完成一次请求（含缓存命中）发出一个 request 事件，
+Weiboutils 每解析完一个响应发出一个 parse 事件，事件为 dict：
+
+    request: kind,endpoint,method,status,bytes,seconds,retries,cache,time
+    parse:   kind,endpoint,seconds,time
+
+endpoint 为去掉 host 和 /ajax/ 前缀的接口路径，如 'statuses/hot_band'、'search/weibo'；
+cache 为 'hit'、'miss'，不可缓存的请求为 None。
+
+用 add_hook 注册任意可调用对象作为 sink，未注册任何 hook 时不构造事件。
+内置 sink：Metrics（计数器和直方图，可导出 Prometheus 文本格式）、
+PrometheusFileSink、JsonLinesSink。
+"""
+import json
+import logging
+import os
+import threading
+import time
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+_hooks = []
+
+
+def add_hook(hook):
+    """
+    hook: 以事件 dict 为参数的可调用对象
+    """
+    _hooks.append(hook)
+    return hook
+
+
+def remove_hook(hook):
+    if hook in _hooks:
+        _hooks.remove(hook)
+
+
+def enabled() -> bool:
+    return bool(_hooks)
+
+
+def emit(event: dict):
+    """
+    把事件交给每个 hook，hook 抛出的异常只记录日志，不影响请求本身
+    """
+    for hook in list(_hooks):
+        try:
+            hook(event)
+        except Exception:
+            logger.exception('metrics hook %r failed', hook)
+
+
+def endpoint_name(url: str) -> str:
+    u = urlparse(url)
+    path = u.path.strip('/')
+    if u.hostname == 's.weibo.com':
+        return 'search/' + (path or 'weibo')
+    if path.startswith('ajax/'):
+        path = path[len('ajax/'):]
+    return path
+
+
+def request_event(method: str, url: str, status: int, size: int, seconds: float,
+                  retries=0, cache=None) -> dict:
+    return {
+        'kind': 'request',
+        'endpoint': endpoint_name(url),
+        'method': method,
+        'status': status,
+        'bytes': size,
+        'seconds': seconds,
+        'retries': retries,
+        'cache': cache,
+        'time': time.time()
+    }
+
+
+def timed_parse(url: str, parse, *args):
+    """
+    调用 parse(*args) 并发出该接口的 parse 事件
+
+    return parse 的返回值
+    """
+    if not _hooks:
+        return parse(*args)
+    result, seconds = timed_call(parse, *args)
+    emit_parse(url, seconds)
+    return result
+
+
+def timed_call(func, *args) -> tuple:
+    """
+    return (func(*args), 耗时秒数)；可在解析进程中调用，由主进程发出 parse 事件
+    """
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def emit_parse(url: str, seconds: float):
+    if _hooks:
+        emit({
+            'kind': 'parse',
+            'endpoint': endpoint_name(url),
+            'seconds': seconds,
+            'time': time.time()
+        })
+
+
+class Metrics:
+    """
+    按接口汇总的计数器和直方图，本身即为一个 hook
+
+    counters: requests(endpoint,status),bytes,retries,cache(endpoint,hit|miss)
+    histograms: request_seconds,parse_seconds（按 endpoint）
+    """
+
+    buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = {}
+            self.bytes = {}
+            self.retries = {}
+            self.cache = {}
+            self.request_seconds = {}
+            self.parse_seconds = {}
+
+    def __call__(self, event: dict):
+        endpoint = event['endpoint']
+        with self._lock:
+            if event['kind'] == 'parse':
+                self._observe(self.parse_seconds, endpoint, event['seconds'])
+                return
+            key = (endpoint, event['status'])
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self.bytes[endpoint] = self.bytes.get(endpoint, 0) + event['bytes']
+            self.retries[endpoint] = self.retries.get(endpoint, 0) + event['retries']
+            if event['cache']:
+                key = (endpoint, event['cache'])
+                self.cache[key] = self.cache.get(key, 0) + 1
+            self._observe(self.request_seconds, endpoint, event['seconds'])
+
+    def _observe(self, histograms: dict, endpoint: str, seconds: float):
+        h = histograms.get(endpoint)
+        if h is None:
+            h = histograms[endpoint] = {
+                'buckets': [0] * len(self.buckets), 'count': 0, 'sum': 0.0}
+        for i, le in enumerate(self.buckets):
+            if seconds <= le:
+                h['buckets'][i] += 1
+        h['count'] += 1
+        h['sum'] += seconds
+
+    def snapshot(self) -> dict:
+        """
+        return 按 endpoint 汇总的 dict：requests,bytes,retries,hits,misses,seconds,parse_seconds
+        """
+        with self._lock:
+            endpoints = {}
+            for (endpoint, status), n in self.requests.items():
+                d = endpoints.setdefault(endpoint, {
+                    'requests': 0, 'status': {}, 'bytes': self.bytes.get(endpoint, 0),
+                    'retries': self.retries.get(endpoint, 0),
+                    'hits': self.cache.get((endpoint, 'hit'), 0),
+                    'misses': self.cache.get((endpoint, 'miss'), 0),
+                    'seconds': self.request_seconds[endpoint]['sum'],
+                    'parse_seconds': self.parse_seconds.get(endpoint, {}).get('sum', 0.0)
+                })
+                d['requests'] += n
+                d['status'][status] = n
+            return endpoints
+
+    def prometheus(self) -> str:
+        """
+        return Prometheus 文本格式的指标
+        """
+        lines = []
+
+        def counter(name, help, samples):
+            lines.append('# HELP %s %s' % (name, help))
+            lines.append('# TYPE %s counter' % name)
+            for labels, value in samples:
+                lines.append('%s{%s} %s' % (name, labels, value))
+
+        def histogram(name, help, histograms):
+            lines.append('# HELP %s %s' % (name, help))
+            lines.append('# TYPE %s histogram' % name)
+            for endpoint, h in sorted(histograms.items()):
+                for le, n in zip(self.buckets, h['buckets']):
+                    lines.append('%s_bucket{endpoint="%s",le="%s"} %d' % (name, endpoint, le, n))
+                lines.append('%s_bucket{endpoint="%s",le="+Inf"} %d' % (name, endpoint, h['count']))
+                lines.append('%s_sum{endpoint="%s"} %f' % (name, endpoint, h['sum']))
+                lines.append('%s_count{endpoint="%s"} %d' % (name, endpoint, h['count']))
+
+        with self._lock:
+            counter('weibo_requests_total', 'Requests by endpoint and status.', [
+                ('endpoint="%s",status="%s"' % k, n) for k, n in sorted(self.requests.items())])
+            counter('weibo_response_bytes_total', 'Response body bytes by endpoint.', [
+                ('endpoint="%s"' % k, n) for k, n in sorted(self.bytes.items())])
+            counter('weibo_retries_total', 'Throttle and 5xx retries by endpoint.', [
+                ('endpoint="%s"' % k, n) for k, n in sorted(self.retries.items())])
+            counter('weibo_cache_total', 'Response cache lookups by endpoint and result.', [
+                ('endpoint="%s",result="%s"' % k, n) for k, n in sorted(self.cache.items())])
+            histogram('weibo_request_seconds', 'Request wall time by endpoint.', self.request_seconds)
+            histogram('weibo_parse_seconds', 'Response parse time by endpoint.', self.parse_seconds)
+        return '\n'.join(lines) + '\n'
+
+
+class PrometheusFileSink:
+    """
+    汇总到 Metrics，并把 Prometheus 文本格式写入 path（供 node_exporter textfile collector 读取）
+
+    interval: 两次写文件之间的最短秒数，close() 时总会写一次
+    """
+
+    def __init__(self, path: str, interval=5.0, metrics: Metrics = None) -> None:
+        self.path = path
+        self.interval = interval
+        self.metrics = metrics or Metrics()
+        self._written = 0.0
+        self._lock = threading.Lock()
+
+    def __call__(self, event: dict):
+        self.metrics(event)
+        if time.monotonic() - self._written >= self.interval:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            self._written = time.monotonic()
+            tmp = self.path + '.tmp'
+            with open(tmp, 'w') as fp:
+                fp.write(self.metrics.prometheus())
+            os.replace(tmp, self.path)
+
+    def close(self):
+        self.flush()
+
+
+class JsonLinesSink:
+    """
+    每个事件写为 path 中的一行 JSON
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._fp = open(path, 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+
+    def __call__(self, event: dict):
+        line = json.dumps(event, ensure_ascii=False)
+        with self._lock:
+            self._fp.write(line + '\n')
+            self._fp.flush()
+
+    def close(self):
+        with self._lock:
+            self._fp.close()
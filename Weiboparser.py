@@ -0,0 +1,209 @@
+"""
+搜索结果页的快速解析（基于 lxml.html + XPath）
+
+一次解析整页，直接取出每张卡片的各字段，返回结构与
+Weiboutils.parse_Weibo_tag / parse_userortopic_tag 相同；
+区别是 text.raw 为各子节点序列化后的 html 字符串列表，而非 BeautifulSoup 节点。
+"""
+import re
+from lxml import etree
+from lxml import html as lxml_html
+
+
+def _cls(name: str) -> str:
+    """
+    XPath 条件：class 中包含 name，等价于 BeautifulSoup 的 class_=name
+    """
+    return "contains(concat(' ', normalize-space(@class), ' '), ' %s ')" % name
+
+
+_weibo_cards = etree.XPath("//div[%s][@mid]" % _cls('card-wrap'))
+_cards = etree.XPath("//div[%s]" % _cls('card'))
+_card_feed = etree.XPath(".//*[%s]" % _cls('card-feed'))
+_card_act_li = etree.XPath("(.//*[%s])[1]//li" % _cls('card-act'))
+_info_name = etree.XPath("(.//*[%s])[1]//a[%s]" % (_cls('info'), _cls('name')))
+_from = etree.XPath(".//*[%s]" % _cls('from'))
+_txt = etree.XPath(".//*[%s][@nick-name]" % _cls('txt'))
+_media = etree.XPath(".//*[%s]" % _cls('media'))
+_img = etree.XPath(".//img")
+_video = etree.XPath(".//video")
+_video_player = etree.XPath(".//video-player")
+_forward_href = etree.XPath(
+    "(((.//*[%s])[1]//*[%s])[1]//*[%s])[1]//a/@href" % (_cls('card-comment'), _cls('func'), _cls('from')))
+_name = etree.XPath(".//*[%s]" % _cls('name'))
+_nobr = etree.XPath(".//*[%s]" % _cls('s-nobr'))
+_m_error = etree.XPath("//*[%s]" % _cls('m-error'))
+_m_page_href = etree.XPath("//*[%s]//a/@href" % _cls('m-page'))
+
+_video_options = re.compile(r'type:\'(?P<type>.*?)\'.*?src:\'(?P<src>.*?)\'')
+_topic_name = re.compile(r'>(?P<name>#.*#)<')
+_topic_num = re.compile(r'>(?P<num>\d.*讨论.*阅读)<')
+page_number = re.compile(r'[?&]page=(\d+)')
+
+
+def _document(page: 'str|bytes'):
+    return lxml_html.fromstring(page)
+
+
+def _walk(el):
+    """
+    按文档顺序遍历 el 内的文本和元素，对应 BeautifulSoup 的 .next 链
+    """
+    if el.text:
+        yield el.text
+    for child in el:
+        yield child
+        yield from _walk(child)
+        if child.tail:
+            yield child.tail
+
+
+def _contents(el) -> list:
+    """
+    对应 BeautifulSoup 的 .contents，元素序列化为 html 字符串
+    """
+    contents = [el.text] if el.text else []
+    for child in el:
+        contents.append(etree.tostring(
+            child, encoding='unicode', method='html', with_tail=False))
+        if child.tail:
+            contents.append(child.tail)
+    return contents
+
+
+def parse_Weibo_card(card) -> dict:
+    """
+    解析一张微博卡片，返回结构同 Weiboutils.parse_Weibo_tag
+    """
+    content_tag = _card_feed(card)[0]
+    act_tags = _card_act_li(card)
+
+    info_tag = _info_name(content_tag)[0]
+    time_tag = [node for node, _ in zip(_walk(_from(content_tag)[0]), range(3))][-1]
+    text_tag = _txt(content_tag)[-1]
+
+    video = None
+    image = None
+    forward = None
+
+    media_tags = _media(content_tag)
+    if media_tags:
+        media_tag = media_tags[0]
+        image_tags = _img(media_tag)
+        if image_tags:
+            image = [tag.get('src').replace('orj360', 'large')
+                     for tag in image_tags]
+        else:
+            video_tags = _video(media_tag)
+            player_tags = _video_player(media_tag)
+            if video_tags:
+                video = {
+                    'type': video_tags[0].get('x5-video-player-type'),
+                    'src': video_tags[0].get('src')
+                }
+            elif player_tags:
+                video = _video_options.search(
+                    player_tags[0].get(':options').replace('\n', '')).groupdict()
+                video['src'] = 'https:'+video['src']
+
+    forward_href = _forward_href(content_tag)
+    if forward_href:
+        forward = 'https:'+forward_href[0]
+
+    info_href = info_tag.get('href')
+    return {
+        'content': {
+            'info': {
+                'url': 'https:'+info_href,
+                'name': info_tag.get('nick-name')
+            },
+            'time': time_tag.strip(),
+            'text': {
+                'text': text_tag.text_content().strip(),
+                'raw': _contents(text_tag)
+            },
+            'video': video,
+            'image': image,
+            'forward': forward
+        },
+        'act': {
+            'forward': act_tags[0].text_content().strip().replace('转发', '0'),
+            'like': act_tags[2].text_content().strip().replace('赞', '0'),
+            'comment': {
+                'num': act_tags[1].text_content().strip().replace('评论', '0'),
+                'mid': card.get('mid'),
+                'uid': re.search(r'/(\d+)\?', info_href).group(1)
+            }
+        }
+    }
+
+
+def parse_userortopic_card(card, type='user') -> dict:
+    """
+    解析一张用户或话题卡片，返回结构同 Weiboutils.parse_userortopic_tag
+    """
+    if type == 'user':
+        name_tag = _name(card)[0]
+        return {
+            'url': 'https:'+name_tag.get('href'),
+            'name': name_tag.text_content(),
+            'num': _nobr(card)[0].text_content()
+        }
+    card_html = etree.tostring(card, encoding='unicode', method='html')
+    d = _topic_name.search(card_html).groupdict()
+    d.update(_topic_num.search(card_html).groupdict())
+    return d
+
+
+def _search_cards(doc, searchtype: str) -> list:
+    if searchtype in ('topic', 'user'):
+        return [parse_userortopic_card(card, searchtype) for card in _cards(doc)]
+    return [parse_Weibo_card(card) for card in _weibo_cards(doc)]
+
+
+def _max_count(doc) -> 'int|None':
+    errors = _m_error(doc)
+    if errors:
+        m = re.search(r'\d+', errors[0].text_content())
+        if m:
+            return int(m.group(0))
+    return None
+
+
+def _last_page(doc) -> 'int|None':
+    pages = [int(m.group(1)) for m in map(page_number.search, _m_page_href(doc)) if m]
+    return max(pages) if pages else None
+
+
+def parse_search_page(page: 'str|bytes', searchtype: str = 'weibo') -> list:
+    """
+    解析整页搜索结果
+
+    page: 搜索结果页 html
+    return: list of dict，每项结构同 parse_Weibo_tag 或 parse_userortopic_tag
+    """
+    return _search_cards(_document(page), searchtype)
+
+
+def parse_max_count(page: 'str|bytes') -> 'int|None':
+    """
+    从 m-error 中取出搜索结果的最大条数，没有时返回 None
+    """
+    return _max_count(_document(page))
+
+
+def parse_last_page(page: 'str|bytes') -> 'int|None':
+    """
+    从分页栏 m-page 中取出最后一页的页码，没有分页栏时返回 None
+    """
+    return _last_page(_document(page))
+
+
+def parse_search_result(page: 'str|bytes', searchtype: str = 'weibo') -> tuple:
+    """
+    一次解析整页，同时取出结果、最大条数和最后一页的页码
+
+    return: (parse_search_page 的结果, parse_max_count 的结果, parse_last_page 的结果)
+    """
+    doc = _document(page)
+    return _search_cards(doc, searchtype), _max_count(doc), _last_page(doc)
@@ -0,0 +1,206 @@
+"""
+热搜榜、话题榜和热门微博的增量轮询
+
+BandPoller 保存上一轮的状态，每轮只返回变化（delta），每个 delta 为 dict：
+
+    op: 'new' | 'drop' | 字段名（该字段发生变化）
+    key: 热搜为 word，话题为 topic，热门微博为 mid
+    rank: 本轮排名（drop 时为上一轮排名），从 0 开始
+    old,new: 字段变化前后的值（new/drop 时为 None）
+    item: 本轮条目（drop 时为上一轮条目）；热门微博为 WeiboSpyder.Weibo
+
+比较的字段：
+    hotband: rank,num
+    topicband: rank,read,mention
+    hotWeibos: rank,reposts_count,comments_count,attitudes_count,edit
+
+热门微博按 mid 持有 Weibo 对象，未变化的微博沿用原对象，
+其已缓存的 text/media/comment 不会重新请求；评论数变化时只丢弃缓存的 comment，
+被编辑时丢弃全部缓存，并从响应缓存中删除其全文和 show 响应，重新获取编辑后的内容。
+分组（allGroups）按 groups_ttl 缓存，不再每轮请求。
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+import Weiboutils as WBapi
+from WeiboSpyder import Weibo
+
+_hotband_fields = ('rank', 'num')
+_topicband_fields = ('rank', 'read', 'mention')
+_post_fields = ('rank', 'reposts_count', 'comments_count', 'attitudes_count', 'edit')
+
+
+def _diff(old: dict, new: dict, fields: tuple, items: dict, old_items: dict) -> list:
+    """
+    old,new: {key: {field: value}}
+    items,old_items: {key: 条目}，作为 delta 的 item
+    """
+    deltas = []
+    for key, values in new.items():
+        if key not in old:
+            deltas.append({'op': 'new', 'key': key, 'rank': values['rank'],
+                           'old': None, 'new': None, 'item': items[key]})
+            continue
+        for field in fields:
+            if values[field] != old[key][field]:
+                deltas.append({'op': field, 'key': key, 'rank': values['rank'],
+                               'old': old[key][field], 'new': values[field], 'item': items[key]})
+    for key, values in old.items():
+        if key not in new:
+            deltas.append({'op': 'drop', 'key': key, 'rank': values['rank'],
+                           'old': None, 'new': None, 'item': old_items[key]})
+    return deltas
+
+
+def _post_state(rank: int, w: dict) -> dict:
+    return {
+        'rank': rank,
+        'reposts_count': w.get('reposts_count'),
+        'comments_count': w.get('comments_count'),
+        'attitudes_count': w.get('attitudes_count'),
+        'edit': (w.get('edit_count', 0), w.get('text_raw'))
+    }
+
+
+class BandPoller:
+    """
+    titles: 要轮询的热门微博分组（见 get_allGroups），为空时不轮询热门微博
+    num: 每个分组获取的微博数
+    hotband,topicband: 是否轮询热搜榜、话题榜
+    deep: 对新出现或被编辑的微博预先获取的属性，如 ('text','media')，
+          在线程池中并发获取；已持有且未变化的微博不会重复获取
+    groups_ttl: 分组缓存的秒数
+
+    attrs: hotband {word: 条目},topicband {topic: 条目},
+           posts {mid: Weibo},hotWeibos {title: [mid]}
+    """
+
+    def __init__(self, titles=('24小时榜',), num=100, hotband=True, topicband=True,
+                 deep=(), groups_ttl=3600, workers=None) -> None:
+        self.titles = tuple(titles)
+        self.num = num
+        self.poll_hotband = hotband
+        self.poll_topicband = topicband
+        self.deep = tuple(deep)
+        self.groups_ttl = groups_ttl
+        self.workers = workers or WBapi.page_workers
+        self.hotgov = {}
+        self.hotband = {}
+        self.topicband = {}
+        self.posts = {}
+        self.hotWeibos = {}
+        self._hotband_state = {}
+        self._topicband_state = {}
+        self._post_state = {}
+        self._groups = None
+        self._groups_time = 0.0
+
+    def groups(self) -> dict:
+        if self._groups is None or time.monotonic() - self._groups_time > self.groups_ttl:
+            band, category = WBapi.get_allGroups()
+            band.update(category)
+            self._groups = band
+            self._groups_time = time.monotonic()
+        return self._groups
+
+    def poll(self) -> dict:
+        """
+        轮询一次
+
+        return dict: hotband,topicband -> list of delta；hotWeibos -> {title: list of delta}
+        """
+        result = {}
+        if self.poll_hotband:
+            result['hotband'] = self._poll_hotband()
+        if self.poll_topicband:
+            result['topicband'] = self._poll_topicband()
+        if self.titles:
+            result['hotWeibos'] = self._poll_hotWeibos()
+        return result
+
+    def run(self, interval=60, rounds=None):
+        """
+        每 interval 秒轮询一次，共 rounds 轮（None 为不停止）
+
+        yield poll() 的结果
+        """
+        n = 0
+        while rounds is None or n < rounds:
+            start = time.monotonic()
+            yield self.poll()
+            n += 1
+            if rounds is None or n < rounds:
+                time.sleep(max(0.0, interval - (time.monotonic() - start)))
+
+    def _poll_hotband(self) -> list:
+        self.hotgov, band_list = WBapi.get_hotband()
+        items = {item['word']: item for item in band_list}
+        state = {item['word']: {'rank': rank, 'num': item['num']}
+                 for rank, item in enumerate(band_list)}
+        deltas = _diff(self._hotband_state, state, _hotband_fields, items, self.hotband)
+        self.hotband, self._hotband_state = items, state
+        return deltas
+
+    def _poll_topicband(self) -> list:
+        topics = WBapi.get_topicband()
+        items = {item['topic']: item for item in topics}
+        state = {item['topic']: {'rank': rank, 'read': item['read'], 'mention': item['mention']}
+                 for rank, item in enumerate(topics)}
+        deltas = _diff(self._topicband_state, state, _topicband_fields, items, self.topicband)
+        self.topicband, self._topicband_state = items, state
+        return deltas
+
+    def _poll_hotWeibos(self) -> dict:
+        groups = self.groups()
+        result = {}
+        fetch = []
+        for title in self.titles:
+            statuses = list(WBapi.iter_hottimeline(
+                groups[title]['gid'], groups[title]['containerid'], self.num))
+            old = self._post_state.get(title, {})
+            state = {}
+            for rank, w in enumerate(statuses):
+                mid = str(w['mid'])
+                if mid not in state:
+                    state[mid] = _post_state(rank, w)
+                    fetch += self._hold(mid, w)
+            old_items = {mid: self.posts[mid] for mid in old}
+            result[title] = _diff(old, state, _post_fields, self.posts, old_items)
+            self._post_state[title] = state
+            self.hotWeibos[title] = list(state)
+        held = {mid for state in self._post_state.values() for mid in state}
+        for mid in list(self.posts):
+            if mid not in held:
+                del self.posts[mid]
+        self._prefetch(fetch)
+        return result
+
+    def _hold(self, mid: str, w: dict) -> list:
+        """
+        更新持有的 Weibo 对象，return 需要预取 deep 属性的 Weibo 列表
+        """
+        weibo = self.posts.get(mid)
+        if weibo is None:
+            weibo = self.posts[mid] = Weibo(w)
+            return [weibo]
+        old = weibo.raw
+        weibo.raw = w
+        if (old.get('edit_count', 0), old.get('text_raw')) != (w.get('edit_count', 0), w.get('text_raw')):
+            # refresh 只删除折叠微博的全文，这里按 mblogid 删除，编辑前后是否折叠都不会读到旧内容
+            if w.get('mblogid'):
+                WBapi.forget_status(w['mblogid'])
+            weibo.refresh()
+            return [weibo]
+        if old.get('comments_count') != w.get('comments_count'):
+            weibo.__dict__.pop('comment', None)
+        return []
+
+    def _prefetch(self, weibos: list):
+        if not self.deep or not weibos:
+            return
+
+        def fetch(weibo):
+            for attr in self.deep:
+                getattr(weibo, attr)
+
+        with ThreadPoolExecutor(min(self.workers, len(weibos))) as executor:
+            list(executor.map(fetch, weibos))
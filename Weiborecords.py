@@ -0,0 +1,123 @@
+"""
+紧凑记录类型
+
+UserRecord / WeiboRecord 用 __slots__ 只保存 shortinfo、statistic、text、media、comment
+所需的字段，代替接口返回的整段 json；keep_raw=True 时另外保留原始 dict。
+WeiboSpyder.CompactWeibo 以 WeiboRecord 为数据源，接口与 Weibo 相同。
+
+记录支持 record['key'] 和 record.get('key')，可在多数只读取少量字段的地方代替 dict。
+"""
+import re
+
+
+class _Record:
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def to_dict(self) -> dict:
+        return {k: getattr(self, k) for k in self.__slots__ if k != 'raw'}
+
+    def __repr__(self) -> str:
+        return '%s(%s)' % (type(self).__name__, ', '.join(
+            '%s=%r' % (k, getattr(self, k)) for k in self.__slots__ if k != 'raw'))
+
+
+class UserRecord(_Record):
+    """
+    attrs: id,screen_name,profile_url,followers_count,friends_count,raw
+    """
+
+    __slots__ = ('id', 'screen_name', 'profile_url',
+                 'followers_count', 'friends_count', 'raw')
+
+    def __init__(self, id, screen_name, profile_url, followers_count, friends_count, raw=None) -> None:
+        self.id = id
+        self.screen_name = screen_name
+        self.profile_url = profile_url
+        self.followers_count = followers_count
+        self.friends_count = friends_count
+        self.raw = raw
+
+    @classmethod
+    def from_dict(cls, d: dict, keep_raw=False) -> 'UserRecord':
+        return cls(d['id'], d.get('screen_name'), d.get('profile_url'),
+                   d.get('followers_count'), d.get('friends_count'), d if keep_raw else None)
+
+
+class WeiboRecord(_Record):
+    """
+    attrs:
+        mid,uid,user_url,user_name,created_at: 接口返回的时间字符串，或搜索页上的时间文本
+        text,text_html: 纯文本和 html（搜索页为 html 片段列表）
+        images: 大图 url 列表（搜索页上没有图片时为 None）; video: 搜索页上的视频 dict
+        longtext_id,video_id,retweet_id: 需另行请求全文、视频、转发原文时的 id，否则为 None
+        forward,comment,like: 计数（搜索页上为字符串）
+        raw: keep_raw=True 时为原始 dict
+    """
+
+    __slots__ = ('mid', 'uid', 'user_url', 'user_name', 'created_at', 'text', 'text_html',
+                 'images', 'video', 'longtext_id', 'video_id', 'retweet_id',
+                 'forward', 'comment', 'like', 'raw')
+
+    @classmethod
+    def from_dict(cls, d: dict, keep_raw=False) -> 'WeiboRecord':
+        """
+        d: Weiboutils 返回的微博 dict（hotWeibos、user_weibo 等接口的 json，
+           或 search_Weibo 解析出的搜索结果）
+        """
+        r = cls.__new__(cls)
+        if 'visible' in d:
+            r._from_api(d)
+        else:
+            r._from_search(d)
+        r.raw = d if keep_raw else None
+        return r
+
+    def _from_api(self, d: dict):
+        self.mid = str(d['mid'])
+        self.uid = d['user']['id']
+        self.user_url = None
+        self.user_name = d['user'].get('screen_name')
+        self.created_at = d['created_at']
+        self.text = d['text_raw']
+        self.text_html = d['text']
+        self.images = ['https://wx1.sinaimg.cn/large/'+imgid+'.jpg' for imgid in d.get('pic_ids', ())]
+        self.video = None
+        self.longtext_id = d['mblogid'] if re.search(r'>展开</span>', d['text']) else None
+        self.video_id = None
+        if 'url_struct' in d:
+            m = re.search(r'fid=(\d+:\d+)', d['url_struct'][0]['long_url'])
+            if m:
+                self.video_id = m.group(1)
+        self.retweet_id = d['retweeted_status']['mblogid'] if 'retweeted_status' in d else None
+        self.forward = d['reposts_count']
+        self.comment = d['comments_count']
+        self.like = d['attitudes_count']
+
+    def _from_search(self, d: dict):
+        content = d['content']
+        self.mid = str(d['act']['comment']['mid'])
+        self.uid = d['act']['comment']['uid']
+        self.user_url = content['info']['url']
+        self.user_name = content['info']['name']
+        self.created_at = content['time']
+        self.text = content['text']['text']
+        self.text_html = content['text']['raw']
+        self.images = content['image']
+        self.video = content['video']
+        self.longtext_id = None
+        self.video_id = None
+        self.retweet_id = None
+        if content['forward']:
+            self.retweet_id = re.search(r'/([^/]*)\?', content['forward']).group(1)
+        self.forward = d['act']['forward']
+        self.comment = d['act']['comment']['num']
+        self.like = d['act']['like']
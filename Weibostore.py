@@ -0,0 +1,340 @@
+"""
+爬取结果的本地存储与检索
+
+WeiboStore 把微博、用户、评论按 mid / uid / 评论 id 写入（upsert）一个 SQLite 文件，
+并记录每条记录的获取时间：
+    - search 按关键词、作者、时间范围在本地检索微博，关键词用 FTS5 trigram 索引
+      （不支持时或关键词不足 3 个字时退回 LIKE）；
+    - stale 给出缺失或超过 max_age 的记录，fetch_users / fetch_comments 只请求这些记录，
+      其余直接从本地读取。
+
+    store = WeiboStore('weibo.db', max_age=3600)
+    spyder = WeiboSpyder(cookies, store=store)     # hotWeibos、search 的结果自动写入
+    spyder.search('天气', num=100)
+    [Weibo(d) for d in store.search('天气', since=time.time() - 86400)]
+    store.fetch_comments(spyder.hotWeibos(num=50))  # 只请求缺失或过期的评论
+"""
+import datetime as dt
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+import Weiboutils as WBapi
+from Weiborecords import WeiboRecord
+from Weiboexport import _count
+
+logger = logging.getLogger(__name__)
+
+# 搜索页上的时间文本为北京时间
+_tz = dt.timezone(dt.timedelta(hours=8))
+
+_schema = '''
+CREATE TABLE IF NOT EXISTS weibos (
+    mid TEXT PRIMARY KEY, uid INTEGER, user_name TEXT, created_at REAL, text TEXT,
+    forward INTEGER, comment INTEGER, "like" INTEGER, raw TEXT, fetched REAL);
+CREATE INDEX IF NOT EXISTS weibos_uid ON weibos (uid, created_at);
+CREATE INDEX IF NOT EXISTS weibos_created ON weibos (created_at);
+CREATE TABLE IF NOT EXISTS users (
+    uid INTEGER PRIMARY KEY, screen_name TEXT, followers_count INTEGER, friends_count INTEGER,
+    raw TEXT, fetched REAL);
+CREATE TABLE IF NOT EXISTS comments (
+    id INTEGER PRIMARY KEY, mid TEXT, uid INTEGER, created_at REAL, text TEXT,
+    like_counts INTEGER, raw TEXT, fetched REAL);
+CREATE INDEX IF NOT EXISTS comments_mid ON comments (mid);
+CREATE TABLE IF NOT EXISTS comment_lists (mid TEXT PRIMARY KEY, fetched REAL);
+'''
+
+
+def _timestamp(created_at: 'str|None', fetched: float) -> 'float|None':
+    """
+    接口的时间字符串，或搜索页上的 'x分钟前'、'今天 10:00'、'10月17日 10:00'、'2025年10月17日 10:00'
+    转为时间戳，无法识别时为 None
+    """
+    if not created_at:
+        return None
+    try:
+        return dt.datetime.strptime(created_at, WBapi.time_pat).timestamp()
+    except ValueError:
+        pass
+    text = created_at.strip()
+    m = re.match(r'(\d+)\s*(秒|分钟)前', text)
+    if m:
+        return fetched - int(m.group(1)) * (60 if m.group(2) == '分钟' else 1)
+    now = dt.datetime.fromtimestamp(fetched, _tz)
+    m = re.match(r'今天\s*(\d+):(\d+)', text)
+    if m:
+        return now.replace(hour=int(m.group(1)), minute=int(m.group(2)), second=0, microsecond=0).timestamp()
+    m = re.match(r'(?:(\d{4})年)?(\d+)月(\d+)日\s*(\d+):(\d+)', text)
+    if m:
+        year = int(m.group(1) or now.year)
+        return dt.datetime(year, int(m.group(2)), int(m.group(3)), int(m.group(4)), int(m.group(5)),
+                           tzinfo=_tz).timestamp()
+    return None
+
+
+def _seconds(t: 'float|dt.datetime|None') -> 'float|None':
+    return t.timestamp() if isinstance(t, dt.datetime) else t
+
+
+def _raw(obj):
+    """
+    Weibo / User / UserRecord 取出原始 dict；CompactWeibo 未保留原始 dict 时返回 None
+    """
+    if isinstance(obj, dict):
+        return obj
+    raw = getattr(obj, 'raw', None)
+    if raw is None and hasattr(obj, 'info'):
+        return obj.info if isinstance(obj.info, dict) else obj.info.raw
+    return raw
+
+
+class WeiboStore:
+    """
+    path: SQLite 文件路径，默认只保存在内存中
+    max_age: 记录的有效秒数，超过后视为过期；各方法的 max_age 参数可单独指定
+    workers: fetch_users / fetch_comments 并发请求的数量
+    """
+
+    def __init__(self, path: str = None, max_age=3600, workers=None) -> None:
+        self.max_age = max_age
+        self.workers = workers or WBapi.page_workers
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path or ':memory:', check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.executescript(_schema)
+        try:
+            # rowid 为整数形式的 mid
+            self._db.execute("CREATE VIRTUAL TABLE IF NOT EXISTS weibos_fts USING fts5("
+                             "text, user_name, tokenize='trigram')")
+            self.fts = True
+        except sqlite3.OperationalError:
+            # SQLite 3.34 之前没有 trigram 分词器
+            self.fts = False
+        self._db.commit()
+
+    def _cutoff(self, max_age) -> float:
+        return time.time() - (self.max_age if max_age is None else max_age)
+
+    # 写入
+
+    def put_weibos(self, weibos) -> int:
+        """
+        写入微博（Weibo、保留了原始 dict 的 CompactWeibo，或 Weiboutils 返回的微博 dict）
+
+        return 写入的条数
+        """
+        now = time.time()
+        rows = {}
+        for w in weibos:
+            d = _raw(w)
+            if d is None:
+                continue
+            r = WeiboRecord.from_dict(d)
+            # 同一批中重复的微博只保留最后一条
+            rows[r.mid] = (r.mid, int(r.uid), r.user_name, _timestamp(r.created_at, now), r.text,
+                         _count(r.forward), _count(r.comment), _count(r.like),
+                         json.dumps(d, ensure_ascii=False, default=str), now)
+        rows = list(rows.values())
+        with self._lock:
+            self._db.executemany('INSERT OR REPLACE INTO weibos VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+            if self.fts:
+                self._db.executemany('DELETE FROM weibos_fts WHERE rowid = ?', [(int(r[0]),) for r in rows])
+                self._db.executemany('INSERT INTO weibos_fts (rowid, text, user_name) VALUES (?, ?, ?)',
+                                     [(int(r[0]), r[4], r[2]) for r in rows])
+            self._db.commit()
+        return len(rows)
+
+    def put_users(self, users) -> int:
+        """
+        写入用户（User、UserRecord，或接口返回的用户 dict）；
+        UserRecord 未保留原始 dict 时只写入 shortinfo 字段
+        """
+        now = time.time()
+        rows = []
+        for u in users:
+            d = _raw(u)
+            if d is None:
+                d = u.to_dict()
+            rows.append((int(d['id']), d.get('screen_name'), d.get('followers_count'),
+                         d.get('friends_count'), json.dumps(d, ensure_ascii=False), now))
+        with self._lock:
+            self._db.executemany('INSERT OR REPLACE INTO users VALUES (?, ?, ?, ?, ?, ?)', rows)
+            self._db.commit()
+        return len(rows)
+
+    def put_comments(self, comments, mid=None, complete=False) -> int:
+        """
+        写入评论（评论 dict，或 CommentCrawler.crawl 产出的 (mid, dict)）
+
+        mid: 评论 dict 所属的微博 mid
+        complete: comments 为该 mid 的全部评论时为 True，之后 comments(mid) 可直接从本地返回
+        """
+        now = time.time()
+        rows = []
+        for c in comments:
+            c_mid = mid
+            if isinstance(c, tuple):
+                c_mid, c = c
+            rows.append((c['id'], None if c_mid is None else str(c_mid), (c.get('user') or {}).get('id'),
+                         _timestamp(c.get('created_at'), now), c.get('text_raw'), c.get('like_counts'),
+                         json.dumps(c, ensure_ascii=False), now))
+        with self._lock:
+            self._db.executemany('INSERT OR REPLACE INTO comments VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows)
+            if complete:
+                assert mid is not None
+                self._db.execute('INSERT OR REPLACE INTO comment_lists VALUES (?, ?)', (str(mid), now))
+            self._db.commit()
+        return len(rows)
+
+    # 读取
+
+    def weibo(self, mid, max_age=None) -> 'dict|None':
+        """
+        return 未过期的微博 dict，缺失或过期时为 None
+        """
+        return self._get('SELECT raw FROM weibos WHERE mid = ? AND fetched >= ?', str(mid), max_age)
+
+    def user(self, uid, max_age=None) -> 'dict|None':
+        """
+        return 未过期的用户 dict，缺失或过期时为 None
+        """
+        return self._get('SELECT raw FROM users WHERE uid = ? AND fetched >= ?', int(uid), max_age)
+
+    def comments(self, mid, max_age=None) -> 'list|None':
+        """
+        return 未过期的全部评论（按 id 排序），没有完整获取过或已过期时为 None
+        """
+        with self._lock:
+            if self._db.execute('SELECT 1 FROM comment_lists WHERE mid = ? AND fetched >= ?',
+                                (str(mid), self._cutoff(max_age))).fetchone() is None:
+                return None
+            rows = self._db.execute('SELECT raw FROM comments WHERE mid = ? ORDER BY id', (str(mid),)).fetchall()
+        return [json.loads(raw) for raw, in rows]
+
+    def _get(self, sql: str, key, max_age) -> 'dict|None':
+        with self._lock:
+            row = self._db.execute(sql, (key, self._cutoff(max_age))).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def stale(self, kind: str, keys, max_age=None) -> list:
+        """
+        kind: 'weibo'（keys 为 mid）| 'user'（uid）| 'comments'（mid，是否完整获取过评论）
+
+        return keys 中缺失或过期的部分，保持原顺序
+        """
+        table, column = {'weibo': ('weibos', 'mid'), 'user': ('users', 'uid'),
+                         'comments': ('comment_lists', 'mid')}[kind]
+        convert = int if kind == 'user' else str
+        keys = [convert(k) for k in keys]
+        fresh = set()
+        with self._lock:
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                fresh.update(k for k, in self._db.execute(
+                    'SELECT %s FROM %s WHERE fetched >= ? AND %s IN (%s)' % (
+                        column, table, column, ','.join('?' * len(chunk))),
+                    [self._cutoff(max_age)] + chunk))
+        return [k for k in keys if k not in fresh]
+
+    def search(self, keyword: str = None, uid=None, since=None, until=None, limit=100) -> list:
+        """
+        在本地检索微博，条件之间为“且”，按发布时间从新到旧排列
+
+        keyword: 正文或作者名中包含的文字
+        uid: 作者 uid
+        since,until: 发布时间范围，datetime 或时间戳
+        return list of 微博 dict
+        """
+        where, params = [], []
+        if keyword:
+            if self.fts and len(keyword) >= 3:
+                where.append('mid IN (SELECT CAST(rowid AS TEXT) FROM weibos_fts WHERE weibos_fts MATCH ?)')
+                params.append('"%s"' % keyword.replace('"', '""'))
+            else:
+                where.append("(text LIKE ? ESCAPE '\\' OR user_name LIKE ? ESCAPE '\\')")
+                pattern = '%' + re.sub(r'([%_\\])', r'\\\1', keyword) + '%'
+                params += [pattern, pattern]
+        if uid is not None:
+            where.append('uid = ?')
+            params.append(int(uid))
+        if since is not None:
+            where.append('created_at >= ?')
+            params.append(_seconds(since))
+        if until is not None:
+            where.append('created_at < ?')
+            params.append(_seconds(until))
+        sql = 'SELECT raw FROM weibos'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY created_at DESC LIMIT ?'
+        with self._lock:
+            rows = self._db.execute(sql, params + [limit]).fetchall()
+        return [json.loads(raw) for raw, in rows]
+
+    # 只请求过期的记录
+
+    def fetch_users(self, uids, max_age=None) -> dict:
+        """
+        获取用户 info：未过期的从本地读取，其余并发请求并写入
+
+        return {uid: 用户 dict}（请求失败的 uid 不在其中）
+        """
+        uids = [int(u) for u in uids]
+        stale = set(self.stale('user', uids, max_age))
+        result = {uid: self.user(uid, float('inf')) for uid in uids if uid not in stale}
+
+        def fetch(uid):
+            return WBapi.get_user_info(uid)['data']['user']
+
+        for uid, info in self._fetch(fetch, stale):
+            self.put_users([info])
+            result[uid] = info
+        return result
+
+    def fetch_comments(self, posts, max_age=None, num=None) -> dict:
+        """
+        获取评论：完整获取过且未过期的从本地读取，其余并发请求并写入
+
+        posts: Weibo 或 (uid, mid) 的列表
+        num: 每条微博最多获取的评论数；不为 None 时结果可能不完整，不记为已完整获取
+        return {mid: 评论列表}（请求失败的 mid 不在其中）
+        """
+        refs = {}
+        for p in posts:
+            uid, mid = (p.comment._uid, p.comment._mid) if hasattr(p, 'comment') else p
+            refs[str(mid)] = uid
+        stale = set(self.stale('comments', refs, max_age))
+        result = {mid: self.comments(mid, float('inf')) for mid in refs if mid not in stale}
+
+        def fetch(mid):
+            return list(islice(WBapi.iter_comments(refs[mid], mid), num))
+
+        for mid, comments in self._fetch(fetch, stale):
+            self.put_comments(comments, mid, complete=num is None)
+            result[mid] = comments
+        return result
+
+    def _fetch(self, fetch, keys):
+        """
+        在线程池中请求，写入在调用方线程中进行
+
+        yield (key, fetch(key))，请求失败的 key 跳过
+        """
+        if not keys:
+            return
+        with ThreadPoolExecutor(min(self.workers, len(keys))) as executor:
+            futures = {executor.submit(fetch, key): key for key in keys}
+            for future, key in futures.items():
+                e = future.exception()
+                if e is not None:
+                    logger.warning('fetch %s failed: %r', key, e)
+                    continue
+                yield key, future.result()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
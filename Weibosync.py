@@ -0,0 +1,125 @@
+"""
+用户微博的增量同步
+
+为每个 uid 持久化已见过的最新微博 id（水位），同步时从第 1 页起逐页获取 mymblog，
+遇到不新于水位的微博即停止，只返回新微博；多个 uid 在线程池中并发同步。
+"""
+import sqlite3
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import islice
+import Weiboutils as WBapi
+
+
+class TimelineSync:
+    """
+    path: (optional) 保存水位的 SQLite 文件路径，默认只保存在内存中
+    initial_pages: 首次同步（没有水位）的 uid 获取的页数
+    max_pages: 每次同步每个 uid 最多获取的页数
+    workers: 同时同步的 uid 数
+    """
+
+    def __init__(self, path: str = None, initial_pages=3, max_pages=50, workers=None) -> None:
+        self.initial_pages = initial_pages
+        self.max_pages = max_pages
+        self.workers = workers or WBapi.page_workers
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path or ':memory:', check_same_thread=False)
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS watermarks (uid TEXT PRIMARY KEY, mid INTEGER, synced REAL)')
+        self._db.commit()
+
+    def watermark(self, uid) -> 'int|None':
+        """
+        return 该 uid 已同步到的最新微博 id，未同步过时为 None
+        """
+        with self._lock:
+            row = self._db.execute(
+                'SELECT mid FROM watermarks WHERE uid = ?', (str(uid),)).fetchone()
+        return row[0] if row else None
+
+    def commit(self, uid, mid: 'int|None'):
+        """
+        记录水位；mid 为 None（没有任何微博）时只记录同步时间
+        """
+        with self._lock:
+            self._db.execute(
+                'INSERT INTO watermarks VALUES (?, ?, ?) ON CONFLICT(uid) DO UPDATE SET'
+                ' mid = COALESCE(excluded.mid, mid), synced = excluded.synced', (str(uid), mid, time.time()))
+            self._db.commit()
+
+    def fetch_new(self, uid) -> tuple:
+        """
+        获取水位之后的新微博，不更新水位
+
+        return (新微博列表（新的在前）, 新水位)
+        """
+        since = self.watermark(uid)
+        pages = self.initial_pages if since is None else self.max_pages
+        statuses = []
+        seen = set()
+        newest = since
+        for page in range(1, pages + 1):
+            page_statuses = WBapi.get_user_weibo_page(uid, page)
+            if not page_statuses:
+                break
+            reached = False
+            for w in page_statuses:
+                if since is not None and w['id'] <= since:
+                    # 置顶微博可能早于水位，不据此停止
+                    reached = reached or not w.get('isTop')
+                    continue
+                # 翻页期间有新微博发布时，上一页的微博会顺延到下一页
+                if w['id'] in seen:
+                    continue
+                seen.add(w['id'])
+                statuses.append(w)
+                newest = w['id'] if newest is None else max(newest, w['id'])
+            if reached:
+                break
+        return statuses, newest
+
+    def sync_user(self, uid) -> list:
+        """
+        同步一个 uid 并更新水位
+
+        return 新微博列表（新的在前）
+        """
+        statuses, newest = self.fetch_new(uid)
+        self.commit(uid, newest)
+        return statuses
+
+    def sync(self, uids):
+        """
+        并发同步多个 uid，按完成顺序产出；
+        每个 uid 的结果产出后才更新其水位，中断后未处理完的 uid 下次会重新获取
+
+        yield (uid, 新微博列表)
+        """
+        uids = iter(uids)
+        executor = ThreadPoolExecutor(self.workers)
+        pending = set()
+
+        def submit(n):
+            for uid in islice(uids, n):
+                pending.add(executor.submit(lambda uid=uid: (uid,) + self.fetch_new(uid)))
+
+        try:
+            submit(self.workers * 2)
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.remove(future)
+                    uid, statuses, newest = future.result()
+                    yield uid, statuses
+                    self.commit(uid, newest)
+                submit(self.workers * 2 - len(pending))
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
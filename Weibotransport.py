@@ -0,0 +1,484 @@
+import re
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from Weibocache import ResponseCache
+import Weibometrics
+
+
+# 被限流时 weibo 返回的状态码
+throttle_status = (414, 418, 429)
+
+# url 片段 --> 接口族，同一接口族共享一个令牌桶
+endpoint_families = (
+    ('s.weibo.com', 'search'),
+    ('buildComments', 'comment'),
+    ('profile/info', 'profile'),
+    ('friendships', 'friendships'),
+    ('hottimeline', 'timeline'),
+    ('mymblog', 'timeline'),
+    ('friendstimeline', 'timeline'),
+    ('statuses/longtext', 'status'),
+    ('statuses/show', 'status'),
+    ('tv/api', 'video'),
+    ('hot_band', 'band'),
+    ('topic_band', 'band'),
+    ('allGroups', 'band'),
+)
+
+
+def endpoint_family(url: str) -> str:
+    for fragment, family in endpoint_families:
+        if fragment in url:
+            return family
+    return 'default'
+
+
+class TokenBucket:
+    """
+    令牌桶，速率按 AIMD 自适应调整
+
+    rate: 每秒请求数，被限流时乘以 decrease，之后每次成功加 max_rate*increase，
+          直至回到 max_rate
+    burst: 桶容量，即允许的瞬时并发请求数
+    cooloff: 两次降速的最小间隔秒数，同时在途的多个请求一起被限流只降速一次
+    """
+
+    def __init__(self, rate=5.0, burst=10, min_rate=0.2, decrease=0.5, increase=0.05, cooloff=1.0) -> None:
+        self.rate = rate
+        self.max_rate = rate
+        self.min_rate = min_rate
+        self.burst = burst
+        self.decrease = decrease
+        self.increase = increase
+        self.cooloff = cooloff
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self._decreased = float('-inf')
+        self._lock = threading.Lock()
+
+    def take(self) -> float:
+        """
+        有令牌时取走一个并返回 0；否则不取，返回按当前速率攒够一个令牌还需等待的秒数
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens +
+                              (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / self.rate
+
+    def acquire(self):
+        # 不预支令牌，醒来后按当前速率重新检查：等待者再多也不会超过 rate，
+        # 降速前开始等待的请求也按降速后的速率放行
+        while True:
+            delay = self.take()
+            if not delay:
+                return
+            time.sleep(delay)
+
+    async def acquire_async(self):
+        import asyncio
+
+        while True:
+            delay = self.take()
+            if not delay:
+                return
+            await asyncio.sleep(delay)
+
+    def throttled(self):
+        with self._lock:
+            now = time.monotonic()
+            if now - self._decreased < self.cooloff:
+                return
+            self._decreased = now
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+
+    def succeeded(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate +
+                            self.max_rate * self.increase)
+
+
+class RateLimiter:
+    """
+    按接口族划分的令牌桶集合
+
+    rates: {接口族: 每秒请求数}，未列出的接口族使用 default_rate
+    """
+
+    default_rates = {
+        'search': 2.0,
+        'comment': 3.0,
+        'friendships': 3.0,
+    }
+
+    def __init__(self, default_rate=5.0, burst=10, rates: dict = None) -> None:
+        self.default_rate = default_rate
+        self.burst = burst
+        self.rates = dict(self.default_rates)
+        self.rates.update(rates or {})
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, family: str) -> TokenBucket:
+        with self._lock:
+            if family not in self._buckets:
+                self._buckets[family] = TokenBucket(
+                    self.rates.get(family, self.default_rate), self.burst)
+            return self._buckets[family]
+
+    def for_url(self, url: str) -> TokenBucket:
+        return self.bucket(endpoint_family(url))
+
+
+_limiter = RateLimiter()
+
+
+def get_rate_limiter() -> RateLimiter:
+    return _limiter
+
+
+def set_rate_limiter(limiter: RateLimiter):
+    """
+    替换同步和异步传输共享的限速器
+    """
+    global _limiter
+    _limiter = limiter
+
+
+_cache = ResponseCache()
+
+
+def get_response_cache() -> 'ResponseCache|None':
+    return _cache
+
+
+def set_response_cache(cache: 'ResponseCache|None'):
+    """
+    替换同步和异步传输共享的响应缓存，传入 None 关闭缓存
+    """
+    global _cache
+    _cache = cache
+
+
+def invalidate(url: str, params: dict = None, method='GET'):
+    """
+    从共享响应缓存中删除该请求的条目，下次请求时重新获取
+    """
+    cache = get_response_cache()
+    if cache is not None:
+        cache.delete(cache.key(method, url, params))
+
+
+def logged_out(r) -> bool:
+    """
+    响应是否表明 cookies 已失效：被重定向到登录页，或接口返回 ok=-100
+    """
+    url = str(getattr(r, 'url', '') or '')
+    if 'passport.weibo.com' in url or 'login.sina.com.cn' in url or 'login.php' in url:
+        return True
+    return r.status_code == 200 and b'"ok":-100' in r.content[:64].replace(b' ', b'')
+
+
+_ok_pat = re.compile(rb'"ok"\s*:\s*(-?\d+)')
+
+
+def _cacheable(r) -> bool:
+    """
+    只缓存看起来有效的响应：200、未被重定向到登录页、body 为 json 且 ok（在开头或结尾）不是错误码
+    """
+    if r.status_code != 200 or logged_out(r):
+        return False
+    body = r.content.strip()
+    if not body.startswith(b'{'):
+        return False
+    m = _ok_pat.search(body[:64]) or _ok_pat.search(body[-64:])
+    return m is None or m.group(1) == b'1'
+
+
+def _cache_lookup(method: str, url: str, params):
+    """
+    return (cache, key, ttl)，该请求不可缓存时返回 (None, None, None)
+    """
+    cache = get_response_cache()
+    ttl = cache.ttl_for(url) if cache is not None and method == 'GET' else None
+    if not ttl:
+        return None, None, None
+    return cache, cache.key(method, url, params), ttl
+
+
+def _cached_response(content: bytes, url: str) -> requests.Response:
+    r = requests.Response()
+    r.status_code = 200
+    r._content = content
+    r.encoding = 'utf-8'
+    r.url = url
+    return r
+
+
+def _emit_request(method, url, r, start, retries, cache):
+    """
+    有 hook 时发出 request 事件，cache: None（不可缓存）,'hit','miss'
+    """
+    if Weibometrics.enabled():
+        Weibometrics.emit(Weibometrics.request_event(
+            method, url, r.status_code, len(r.content), time.perf_counter() - start, retries, cache))
+
+
+def _urllib3_retries(r: requests.Response) -> int:
+    retries = getattr(r.raw, 'retries', None)
+    return len(retries.history) if retries is not None else 0
+
+
+def _throttle_delay(attempt: int, retry_after, max_backoff: float) -> float:
+    """
+    优先服从 Retry-After，否则按 1,2,4... 秒指数退避
+    """
+    if retry_after and str(retry_after).isdigit():
+        return min(float(retry_after), max_backoff)
+    return min(2 ** attempt, max_backoff)
+
+
+class Transport:
+    """
+    共享 HTTP 传输层
+
+    持有一个 requests.Session 及其 keep-alive 连接池，
+    Weiboutils 的所有接口和 WeiboSpyder 中的模型类都经由它发送请求，
+    避免每次调用都重新建立 TCP+TLS 连接。
+
+    每个请求先从共享限速器中对应接口族的令牌桶取令牌；
+    遇到限流状态码时降低该接口族速率并退避重试，而不是直接失败。
+
+    pool_size: 每个 host 保持的连接数
+    timeout: (connect, read) 超时秒数
+    retries: 连接错误及 5xx 的重试次数
+    throttle_retries: 被限流时的重试次数
+    max_backoff: 限流退避的最长等待秒数
+    limiter: (optional) 该传输独用的限速器，默认使用全局共享的限速器
+    """
+
+    def __init__(self, pool_size=10, timeout=(5, 15), retries=3, backoff_factor=0.5,
+                 throttle_retries=6, max_backoff=120, limiter: RateLimiter = None) -> None:
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.retries = retries
+        self.throttle_retries = throttle_retries
+        self.max_backoff = max_backoff
+        self.limiter = limiter
+        self.session = requests.Session()
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(500, 502, 503, 504),
+            allowed_methods=None,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def request(self, method: str, url: str, use_cache=True, **kwargs) -> requests.Response:
+        """
+        use_cache: 为 False 时不读写响应缓存
+        """
+        start = time.perf_counter()
+        kwargs.setdefault('timeout', self.timeout)
+        cache, key, ttl = _cache_lookup(method, url, kwargs.get('params')) if use_cache else (None, None, None)
+        if cache is not None:
+            content = cache.get(key)
+            if content is not None:
+                r = _cached_response(content, url)
+                _emit_request(method, url, r, start, 0, 'hit')
+                return r
+
+        bucket = (self.limiter or get_rate_limiter()).for_url(url)
+        retries = 0
+        for attempt in range(self.throttle_retries + 1):
+            bucket.acquire()
+            r = self.session.request(method, url, **kwargs)
+            retries += _urllib3_retries(r)
+            if r.status_code not in throttle_status:
+                bucket.succeeded()
+                if cache is not None and _cacheable(r):
+                    cache.set(key, r.content, ttl)
+                break
+            bucket.throttled()
+            if attempt < self.throttle_retries:
+                retries += 1
+                time.sleep(_throttle_delay(
+                    attempt, r.headers.get('Retry-After'), self.max_backoff))
+        _emit_request(method, url, r, start, retries,
+                      None if cache is None else 'miss')
+        return r
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request('POST', url, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+_transport = Transport()
+
+
+def get_transport() -> Transport:
+    return _transport
+
+
+def set_transport(transport: Transport):
+    """
+    替换全局共享的传输对象，旧对象的连接池会被关闭
+    """
+    global _transport
+    if transport is not _transport:
+        _transport.close()
+    _transport = transport
+
+
+def configure(pool_size=10, timeout=(5, 15), retries=3, backoff_factor=0.5,
+              throttle_retries=6, max_backoff=120):
+    """
+    按给定连接池大小、超时和重试次数重建全局传输对象
+    """
+    set_transport(Transport(pool_size, timeout, retries, backoff_factor,
+                            throttle_retries, max_backoff))
+
+
+class Response:
+    """
+    异步传输返回的响应，只保留 Weiboutils 解析所需的字段，
+    与 requests.Response 的 status_code/content/text 用法一致
+    """
+
+    def __init__(self, status_code: int, content: bytes, encoding='utf-8', url: str = None) -> None:
+        self.status_code = status_code
+        self.content = content
+        self.encoding = encoding
+        self.url = url
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding or 'utf-8', errors='replace')
+
+
+class AsyncTransport:
+    """
+    异步共享 HTTP 传输层（需要 aiohttp）
+
+    持有一个 aiohttp.ClientSession，在首次请求时于当前事件循环中创建。
+    参数含义同 Transport，pool_size 为同时打开的最大连接数，
+    未指定 limiter 时与 Transport 共享同一个限速器。
+    """
+
+    retry_status = (500, 502, 503, 504)
+
+    def __init__(self, pool_size=100, timeout=(5, 15), retries=3, backoff_factor=0.5,
+                 throttle_retries=6, max_backoff=120, limiter: RateLimiter = None) -> None:
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.throttle_retries = throttle_retries
+        self.max_backoff = max_backoff
+        self.limiter = limiter
+        self._session = None
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            import aiohttp
+            connector = aiohttp.TCPConnector(limit=self.pool_size)
+            timeout = aiohttp.ClientTimeout(
+                sock_connect=self.timeout[0], sock_read=self.timeout[1])
+            self._session = aiohttp.ClientSession(
+                connector=connector, timeout=timeout)
+        return self._session
+
+    async def request(self, method: str, url: str, params=None, headers=None, use_cache=True, **kwargs) -> Response:
+        import asyncio
+
+        start = time.perf_counter()
+        cache, key, ttl = _cache_lookup(method, url, params) if use_cache else (None, None, None)
+        if cache is not None:
+            content = cache.get(key)
+            if content is not None:
+                r = Response(200, content, url=url)
+                _emit_request(method, url, r, start, 0, 'hit')
+                return r
+
+        bucket = (self.limiter or get_rate_limiter()).for_url(url)
+        retries = 0
+        for attempt in range(self.throttle_retries + 1):
+            await bucket.acquire_async()
+            r, retry_after, errors = await self._request(method, url, params, headers, **kwargs)
+            retries += errors
+            if r.status_code not in throttle_status:
+                bucket.succeeded()
+                if cache is not None and _cacheable(r):
+                    cache.set(key, r.content, ttl)
+                break
+            bucket.throttled()
+            if attempt < self.throttle_retries:
+                retries += 1
+                await asyncio.sleep(_throttle_delay(attempt, retry_after, self.max_backoff))
+        _emit_request(method, url, r, start, retries,
+                      None if cache is None else 'miss')
+        return r
+
+    async def _request(self, method, url, params, headers, **kwargs):
+        """
+        return (Response, Retry-After, 连接错误及 5xx 的重试次数)
+        """
+        import asyncio
+        import aiohttp
+
+        session = self._get_session()
+        if params:
+            params = {k: str(v) for k, v in params.items()}
+        for attempt in range(self.retries + 1):
+            try:
+                async with session.request(method, url, params=params, headers=headers, **kwargs) as resp:
+                    content = await resp.read()
+                    if resp.status not in self.retry_status or attempt == self.retries:
+                        r = Response(resp.status, content, resp.charset, url)
+                        return r, resp.headers.get('Retry-After'), attempt
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                if attempt == self.retries:
+                    raise
+            await asyncio.sleep(self.backoff_factor * 2 ** attempt)
+
+    async def get(self, url: str, **kwargs) -> Response:
+        return await self.request('GET', url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> Response:
+        return await self.request('POST', url, **kwargs)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+_async_transport = AsyncTransport()
+
+
+def get_async_transport() -> AsyncTransport:
+    return _async_transport
+
+
+def set_async_transport(transport: AsyncTransport):
+    """
+    替换全局共享的异步传输对象，调用方负责关闭旧对象
+    """
+    global _async_transport
+    _async_transport = transport
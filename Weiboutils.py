@@ -1,13 +1,34 @@
 import re
+import os
 import json
-import requests
-from pandas import DataFrame as df
+import threading
+import multiprocessing
 import datetime as dt
-from bs4 import BeautifulSoup
-from logging import Logger
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import TYPE_CHECKING
+import logging
+from Weibotransport import (AsyncTransport, Transport, configure, get_async_transport, get_transport, invalidate,
+                            set_async_transport, set_transport)
+from Weiboaccounts import AccountPool, AsyncAccountPool
+from Weiborecords import UserRecord
+from Weiboparser import page_number, parse_search_page, parse_search_result
+from Weibometrics import emit_parse, timed_call, timed_parse
+
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup
+
+logger = logging.getLogger(__name__)
 
 time_pat = '%a %b %d %H:%M:%S %z %Y'
 cookies_path = './weibo_cookies.txt'
+# 分页接口并发获取的最大线程数
+page_workers = 8
+# 搜索结果页的解析进程池及其待解析页数的上限，见 set_parse_processes
+_parse_pool = None
+_parse_slots = None
+# clear_accounts 在事件循环中关闭旧账号池的任务
+_closing = set()
 
 
 def set_cookies(cookies: str):
@@ -35,6 +56,144 @@ def get_headers():
     return _headers
 
 
+def set_accounts(accounts: list, strategy='round_robin', **pool_param) -> AccountPool:
+    """
+    使用多账号池代替单一 cookies，同步和异步接口的请求都在这些账号间调度
+
+    accounts: cookies 字符串或 Weiboaccounts.Account 的列表
+    strategy: 'round_robin' | 'least_loaded'
+    pool_param: 传给 AccountPool，如 retries,max_wait
+
+    return 同步账号池，可用 stats() 查看各账号状态
+    """
+    pool = AccountPool(accounts, strategy, **pool_param)
+    set_transport(pool)
+    set_async_transport(AsyncAccountPool(pool.accounts, strategy, **pool_param))
+    return pool
+
+
+def clear_accounts():
+    """
+    停用 set_accounts 安装的账号池，恢复为使用 set_headers 中单一 cookies 的 Transport / AsyncTransport
+
+    被替换的异步账号池在当前事件循环中关闭（没有运行中的事件循环时同步关闭）
+    """
+    if isinstance(get_transport(), AccountPool):
+        set_transport(Transport())
+    pool = get_async_transport()
+    if isinstance(pool, AccountPool):
+        set_async_transport(AsyncTransport())
+        import asyncio
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            asyncio.run(pool.close())
+        else:
+            # 保留任务的引用直到关闭完成
+            task = loop.create_task(pool.close())
+            _closing.add(task)
+            task.add_done_callback(_closing.discard)
+
+
+def set_parse_processes(processes: int = None, backlog=2):
+    """
+    启用（processes 默认为 CPU 数）或关闭（processes=0）搜索结果页的解析进程池
+
+    启用后 search_Weibo、iter_search_many 等快速解析路径中，下载线程取得 html 后即交给进程池解析，
+    随即下载下一页；进程池中已有 processes * backlog 页待解析时下载线程阻塞等待（背压）。
+    search_Weibo_tags 返回的 BeautifulSoup tag 无法跨进程传递，仍在下载线程中解析。
+
+    解析进程以 forkserver（不支持时为 spawn）方式启动，避免从已有下载线程的进程中 fork 而死锁；
+    因此调用方的主模块需要放在 if __name__ == '__main__': 之下。
+    """
+    global _parse_pool, _parse_slots
+    if _parse_pool is not None:
+        _parse_pool.shutdown()
+    _parse_pool = _parse_slots = None
+    if processes != 0:
+        processes = processes or os.cpu_count()
+        start = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+        _parse_pool = ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context(start))
+        _parse_slots = threading.BoundedSemaphore(processes * backlog)
+
+
+def _deferred_parse(url: str, parse, *args):
+    """
+    未启用解析进程池时直接解析，返回 parse 的结果；
+    否则把解析提交到进程池，返回其 Future（parse 事件在解析完成后由本进程发出）
+    """
+    if _parse_pool is None:
+        return timed_parse(url, parse, *args)
+    slots = _parse_slots
+    slots.acquire()
+    result = Future()
+    # 已在解析中，不能再取消
+    result.set_running_or_notify_cancel()
+
+    def done(future):
+        slots.release()
+        try:
+            value, seconds = future.result()
+        except BaseException as e:
+            result.set_exception(e)
+            return
+        emit_parse(url, seconds)
+        result.set_result(value)
+
+    try:
+        _parse_pool.submit(timed_call, parse, *args).add_done_callback(done)
+    except BaseException:
+        slots.release()
+        raise
+    return result
+
+
+def _parse(r, parse=json.loads):
+    """
+    解析响应 body，并上报该接口的解析耗时
+    """
+    return timed_parse(r.url, parse, r.content)
+
+
+def _iter_pages(fetch_page, num, page_size, workers=None, is_last=None, pages=None):
+    """
+    按 num 和每页大小预估所需页数，保持至多 workers 页并发获取，按页码顺序逐条产出
+
+    某页满足 is_last（默认为空页）或到达第 pages 页时停止；
+    num 为 None 时不限条数。生成器提前关闭时，未开始的请求被取消。
+    fetch_page 可以返回结果列表的 Future（如 _deferred_parse 的返回值）。
+    """
+    workers = workers or page_workers
+    is_last = is_last or (lambda items: not items)
+    executor = ThreadPoolExecutor(workers)
+    futures = deque()
+    count = 0
+    page = 1
+    try:
+        while num is None or count < num:
+            wanted = workers if num is None else -(-(num - count) // page_size)
+            while len(futures) < min(wanted, workers) and (pages is None or page <= pages):
+                futures.append(executor.submit(fetch_page, page))
+                page += 1
+            if not futures:
+                return
+            page_items = futures.popleft().result()
+            if isinstance(page_items, Future):
+                # fetch_page 把解析交给了解析进程池
+                page_items = page_items.result()
+            if num is not None:
+                page_items = page_items[:num - count]
+            for item in page_items:
+                yield item
+            count += len(page_items)
+            if is_last(page_items):
+                return
+    finally:
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+
 def get_hotband():
     """
     热搜榜
@@ -48,9 +207,13 @@ def get_hotband():
     """
 
     url = "https://weibo.com/ajax/statuses/hot_band"
-    r = requests.get(url)
+    r = get_transport().get(url)
     assert r.status_code == 200
-    hotband_raw_data = json.loads(r.content)['data']
+    return _parse(r, _parse_hotband)
+
+
+def _parse_hotband(content: bytes):
+    hotband_raw_data = json.loads(content)['data']
     if 'hotgov' in hotband_raw_data:
         hotgov = {
             'mid': hotband_raw_data['hotgov']['mid'],
@@ -78,9 +241,13 @@ def get_topicband():
         key:topic,claim:{uid,user},mention,read,summary,category,mid
     """
     url = 'https://weibo.com/ajax/statuses/topic_band'
-    r = requests.get(url)
+    r = get_transport().get(url)
     assert r.status_code == 200
-    topicband_raw_data = json.loads(r.content)['data']['statuses']
+    return _parse(r, _parse_topicband)
+
+
+def _parse_topicband(content: bytes):
+    topicband_raw_data = json.loads(content)['data']['statuses']
     keys = ('topic', 'mention', 'read', 'category')
     topicband = [{k: item[k] for k in keys} for item in topicband_raw_data]
     return topicband
@@ -96,9 +263,13 @@ def get_allGroups():
     """
     url = 'https://weibo.com/ajax/feed/allGroups'
 
-    r = requests.get(url, headers=_headers)
+    r = get_transport().get(url, headers=_headers)
     assert r.status_code == 200
-    group_raw = json.loads(r.content)['groups'][3:]
+    return _parse(r, _parse_allGroups)
+
+
+def _parse_allGroups(content: bytes):
+    group_raw = json.loads(content)['groups'][3:]
     group_category_raw = group_raw[0]['group']
     group_band_raw = group_raw[1]['group']
     group_category = {
@@ -121,30 +292,7 @@ def get_hotWeibos(title: str = '24小时榜', num=100):
     //note:id used to get comments as mid,
             user id used to get comments as uid//
     """
-    groups, g1 = get_allGroups()
-    groups.update(g1)
-    gid = groups[title]['gid']
-    cid = groups[title]['containerid']
-    page = 1
-
-    url = "https://weibo.com/ajax/feed/hottimeline"
-    params = {
-        "group_id": gid,
-        "containerid": cid,
-        "extparam": "discover|new_feed",
-        'max_id': page
-    }
-
-    hotWeibos_raw = []
-    if num > 400:
-        num = 400
-    while len(hotWeibos_raw) < num:
-        r = requests.get(url, headers=_headers, params=params)
-        assert r.status_code == 200
-        hotWeibos_raw += json.loads(r.content)['statuses']
-        page += 1
-        params['max_id'] = page
-    hotWeibos = hotWeibos_raw[:num]
+    hotWeibos = list(iter_hotWeibos(title, num))
 
     # dict_keys = ('created_at', 'id', 'mblogid', 'text_raw', 'text',
     #              'reposts_count', 'comments_count', 'attitudes_count')
@@ -162,7 +310,49 @@ def get_hotWeibos(title: str = '24小时榜', num=100):
     return hotWeibos
 
 
-def search_Weibo_raw(keyword: str, searchtype: str = 'weibo', page=1, **search_param) -> BeautifulSoup:
+def iter_hotWeibos(title: str = '24小时榜', num=100):
+    """
+    同 get_hotWeibos，但以生成器逐条产出，页面到达即可处理，也可提前停止
+
+    yield json-like dict
+    """
+    groups, g1 = get_allGroups()
+    groups.update(g1)
+    yield from iter_hottimeline(groups[title]['gid'], groups[title]['containerid'], num)
+
+
+def iter_hottimeline(gid, cid, num=100):
+    """
+    按分组的 gid 和 containerid 获取热门微博；
+    已持有 get_allGroups 的结果时用它代替 iter_hotWeibos，省去分组请求
+
+    yield json-like dict
+    """
+    url = "https://weibo.com/ajax/feed/hottimeline"
+
+    def fetch_page(page):
+        params = {
+            "group_id": gid,
+            "containerid": cid,
+            "extparam": "discover|new_feed",
+            'max_id': page
+        }
+        r = get_transport().get(url, headers=_headers, params=params)
+        assert r.status_code == 200
+        return _parse(r)['statuses']
+
+    if num > 400:
+        num = 400
+    yield from _iter_pages(fetch_page, num, _hot_page_size)
+
+
+# 各分页接口每页的大致条数，用于预估并发获取的页数
+_hot_page_size = 10
+_search_page_size = 10
+_follow_page_size = 20
+
+
+def search_Weibo_raw(keyword: str, searchtype: str = 'weibo', page=1, **search_param) -> 'BeautifulSoup':
     """
     搜索微博(原始接口)
 
@@ -178,8 +368,49 @@ def search_Weibo_raw(keyword: str, searchtype: str = 'weibo', page=1, **search_p
         html soup
 
     """
-    types = ('weibo', 'realtime', 'user', 'video', 'topic')
-    assert searchtype in types
+    return _search_soup(search_Weibo_html(keyword, searchtype, page, **search_param), searchtype)
+
+
+def search_Weibo_html(keyword: str, searchtype: str = 'weibo', page=1, **search_param) -> str:
+    """
+    搜索微博，返回未解析的 html，参数同 search_Weibo_raw
+    """
+    url, params_dict = _search_request(keyword, searchtype, page, search_param)
+    r = get_transport().get(url, headers=_headers, params=params_dict)
+    assert r.status_code == 200
+    return r.text
+
+
+def _search_soup(html: str, searchtype: str) -> 'BeautifulSoup':
+    # bs4 只有 *_raw 接口用到，导入较慢，用到时才导入
+    from bs4 import BeautifulSoup
+    return timed_parse('https://s.weibo.com/'+searchtype, BeautifulSoup, html, 'lxml')
+
+
+def _parse_search(html: str, searchtype: str) -> list:
+    return timed_parse('https://s.weibo.com/'+searchtype, parse_search_page, html, searchtype)
+
+
+def _search_result(html: str, searchtype: str) -> tuple:
+    """
+    return (解析结果列表, 最大条数, 最后一页页码)
+    """
+    return timed_parse('https://s.weibo.com/'+searchtype, parse_search_result, html, searchtype)
+
+
+def _search_tags_result(html: str, searchtype: str) -> tuple:
+    """
+    同 _search_result，结果为 html tag 列表
+    """
+    soup = _search_soup(html, searchtype)
+    return _search_page_tags(soup, searchtype), _search_max_count(soup), _search_last_page(soup)
+
+
+_search_types = ('weibo', 'realtime', 'user', 'video', 'topic')
+
+
+def _search_request(keyword: str, searchtype: str, page, search_param: dict):
+    assert searchtype in _search_types
 
     url = 'https://s.weibo.com/'
 
@@ -191,12 +422,7 @@ def search_Weibo_raw(keyword: str, searchtype: str = 'weibo', page=1, **search_p
         params_dict.update({"rd": "realtime"})
     if search_param:
         params_dict.update(search_param)
-
-    r = requests.get(url=url+searchtype, headers=_headers, params=params_dict)
-    assert r.status_code == 200
-
-    soup = BeautifulSoup(r.text, 'lxml')
-    return soup
+    return url+searchtype, params_dict
 
 
 def search_Weibo_tags(keyword: str, searchtype: str = 'weibo', num=10, **search_param) -> list:
@@ -214,33 +440,240 @@ def search_Weibo_tags(keyword: str, searchtype: str = 'weibo', num=10, **search_
     return:
         list of required html tags
     """
+    return list(iter_search_Weibo_tags(keyword, searchtype, num, **search_param))
+
+
+def iter_search_Weibo_tags(keyword: str, searchtype: str = 'weibo', num=10, **search_param):
+    """
+    同 search_Weibo_tags，但以生成器逐条产出
+
+    yield html tag
+    """
+    def fetch_page(page):
+        return _search_tags_result(search_Weibo_html(keyword, searchtype, page, **search_param), searchtype)
+
+    yield from _iter_search(fetch_page, searchtype, num, search_param)
+
+
+def search_Weibo(keyword: str, searchtype: str = 'weibo', num=10, **search_param) -> list:
+    """
+    搜索微博并解析（快速解析路径）
+
+    参数同 search_Weibo_tags，每页 html 由 Weiboparser 一次解析完毕
+
+    return:
+        list of dict，结构同 parse_Weibo_tag 或 parse_userortopic_tag
+        (text.raw 为 html 字符串列表)
+    """
+    return list(iter_search_Weibo(keyword, searchtype, num, **search_param))
+
+
+def iter_search_Weibo(keyword: str, searchtype: str = 'weibo', num=10, **search_param):
+    """
+    同 search_Weibo，但以生成器逐条产出
+
+    yield dict
+    """
+    def fetch_page(page):
+        html = search_Weibo_html(keyword, searchtype, page, **search_param)
+        return _deferred_parse('https://s.weibo.com/'+searchtype, parse_search_result, html, searchtype)
+
+    def fetch_items(page):
+        html = search_Weibo_html(keyword, searchtype, page, **search_param)
+        return _deferred_parse('https://s.weibo.com/'+searchtype, parse_search_page, html, searchtype)
+
+    yield from _iter_search(fetch_page, searchtype, num, search_param, fetch_items)
+
+
+def _iter_search(fetch_page, searchtype: str, num: int, search_param: dict, fetch_items=None):
+    """
+    先获取第 1 页，按其中的最大条数和分页栏确定条数和页数，按其条数预估每页大小；
+    第 1 页的结果直接复用，其余页由 _iter_pages 并发预取，不会请求最后一页之后的页
+
+    fetch_page: 参数为页码，返回 (结果列表, 最大条数, 最后一页页码) 或其 Future
+    fetch_items: (optional) 参数为页码，返回第 2 页起的结果列表或其 Future，默认取 fetch_page 的结果列表
+    """
+    first = fetch_page(1)
+    if isinstance(first, Future):
+        # 第 1 页同样在解析进程池中解析，这里只等待结果
+        first = first.result()
+    first, max_count, last_page = first
+    num, pages = _search_bounds(searchtype, num, search_param, max_count, last_page)
+
+    def page_items(page):
+        if page == 1:
+            return first
+        return fetch_items(page) if fetch_items else fetch_page(page)[0]
+
+    yield from _iter_pages(page_items, num, len(first) or _search_page_size, pages=pages)
+
+
+def _search_bounds(searchtype: str, num: int, search_param: dict, max_count: 'int|None', last_page: 'int|None') -> tuple:
+    """
+    return (条数, 页数)；topic 只取第 1 页的全部结果
+    """
+    if searchtype == 'topic':
+        return None, 1
     if searchtype == 'weibo' and ('nodup' not in search_param):
-        soup = search_Weibo_raw(keyword, searchtype, **search_param)
-        if soup.find(class_='m-error') and re.search(r'\d+', soup.find(class_='m-error').text):
-            MaxNum = int(
-                re.search(r'\d+', soup.find(class_='m-error').text).group(0))
-            if num > MaxNum:
-                logger = Logger('search_Weibo_tags')
-                logger.warning(
-                    'Search number is too large,reset to MAX= %d' % MaxNum)
-                num = MaxNum
-
-    tags = []
-    page = 1
+        num = _limit_search_num(num, max_count)
+    return num, last_page
 
-    while len(tags) < num:
-        soup = search_Weibo_raw(keyword, searchtype, page, **search_param)
-        if searchtype in ('topic', 'user'):
-            tags += soup.findAll('div', class_='card')
-            if searchtype == 'topic':
-                return tags
-        else:
-            tags += soup.findAll('div', class_='card-wrap', mid=True)
-        page += 1
-    return tags[:num]
+
+def iter_search_many(specs, workers=None, dedupe=True):
+    """
+    并发执行多个搜索，按完成顺序产出带标记的结果
+
+    specs: 搜索参数的列表，每项为 keyword、(keyword[, searchtype[, num[, search_param]]]) 或
+           dict(keyword=..., searchtype=..., num=..., params=...)，各项含义同 search_Weibo
+    workers: 所有搜索共用的并发请求数，请求速率仍受共享的限速器约束
+    dedupe: 为 True 时多个搜索（及同一搜索的多页）中重复的微博只产出第一次出现的一条，
+            微博按 mid、用户按主页 url、话题按名称判断；num 按去重后实际产出的条数计
+
+    各搜索先获取第 1 页，按其中的最大条数和分页栏确定所需页数后，其余页与其他搜索的页
+    在同一线程池中并发获取；某页为空时取消该搜索尚未开始的页。去重后条数不足时逐页补取，
+    直至最后一页。请求失败的页记录日志后跳过。
+    启用 set_parse_processes 时各页在解析进程池中解析。
+
+    yield (spec, dict)：spec 为 specs 中的原对象，dict 结构同 search_Weibo
+    """
+    specs = list(specs)
+    searches = [_search_spec(spec) for spec in specs]
+    remaining = [num for _, _, num, _ in searches]
+    last_pages = [None] * len(searches)
+    next_pages = [2] * len(searches)
+    exhausted = set()
+    seen = set()
+    executor = ThreadPoolExecutor(workers or page_workers)
+    pending = {}
+
+    def fetch(keyword, searchtype, page, params):
+        html = search_Weibo_html(keyword, searchtype, page, **params)
+        return _deferred_parse('https://s.weibo.com/'+searchtype, parse_search_result, html, searchtype)
+
+    def submit(i, page):
+        keyword, searchtype, _, params = searches[i]
+        pending[executor.submit(fetch, keyword, searchtype, page, params)] = (i, page)
+
+    def cancel(i):
+        for future, (j, _) in list(pending.items()):
+            if j == i and future.cancel():
+                del pending[future]
+
+    try:
+        for i in range(len(searches)):
+            submit(i, 1)
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                i, page = pending.pop(future)
+                keyword, searchtype, num, params = searches[i]
+                e = future.exception()
+                if e is not None:
+                    logger.warning('search %r %s page %d failed: %r', keyword, searchtype, page, e)
+                    continue
+                result = future.result()
+                if isinstance(result, Future):
+                    # 已下载，等待解析进程池解析完毕
+                    pending[result] = (i, page)
+                    continue
+                items, max_count, last_page = result
+                if page == 1:
+                    num, pages = _search_bounds(searchtype, num, params, max_count, last_page)
+                    remaining[i], last_pages[i] = num, pages
+                    if num is not None:
+                        wanted = -(-num // (len(items) or _search_page_size))
+                        pages = wanted if pages is None else min(pages, wanted)
+                    for p in range(2, (pages or 1) + 1 if items else 0):
+                        submit(i, p)
+                    next_pages[i] = max(2, (pages or 1) + 1)
+                if not items:
+                    exhausted.add(i)
+                    cancel(i)
+                for d in items:
+                    if remaining[i] == 0:
+                        break
+                    if dedupe:
+                        key = _search_key(d, searchtype)
+                        if key in seen:
+                            continue
+                        seen.add(key)
+                    if remaining[i] is not None:
+                        remaining[i] -= 1
+                    yield specs[i], d
+                if remaining[i] == 0:
+                    cancel(i)
+                elif (remaining[i] and i not in exhausted and all(j != i for j, _ in pending.values())
+                      and (last_pages[i] is None or next_pages[i] <= last_pages[i])):
+                    # 预估的页已取完，去重后条数仍不足，补取下一页
+                    submit(i, next_pages[i])
+                    next_pages[i] += 1
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+
+def _search_spec(spec) -> tuple:
+    """
+    return (keyword, searchtype, num, search_param)
+    """
+    if isinstance(spec, str):
+        spec = (spec,)
+    if isinstance(spec, dict):
+        spec = (spec['keyword'], spec.get('searchtype', 'weibo'), spec.get('num', 10), spec.get('params'))
+    keyword, searchtype, num, params = tuple(spec) + (None,) * (4 - len(spec))
+    searchtype = searchtype or 'weibo'
+    assert searchtype in _search_types
+    return keyword, searchtype, 10 if num is None else num, params or {}
+
+
+def _search_key(d: dict, searchtype: str):
+    if searchtype == 'user':
+        return 'user', d['url']
+    if searchtype == 'topic':
+        return 'topic', d['name']
+    return 'weibo', str(d['act']['comment']['mid'])
+
+
+def _search_max_count(soup: 'BeautifulSoup') -> 'int|None':
+    """
+    m-error 中给出的最大结果数
+    """
+    error = soup.find(class_='m-error')
+    if error:
+        m = re.search(r'\d+', error.text)
+        if m:
+            return int(m.group(0))
+    return None
 
 
-def parse_Weibo_tag(tag: BeautifulSoup) -> dict:
+def _search_last_page(soup: 'BeautifulSoup') -> 'int|None':
+    """
+    分页栏 m-page 中最后一页的页码
+    """
+    m_page = soup.find(class_='m-page')
+    if m_page is None:
+        return None
+    pages = [int(m.group(1)) for m in (page_number.search(a['href'])
+                                       for a in m_page.find_all('a', href=True)) if m]
+    return max(pages) if pages else None
+
+
+def _limit_search_num(num: int, MaxNum: 'int|None') -> int:
+    if MaxNum is not None and num > MaxNum:
+        logger.warning(
+            'Search number is too large,reset to MAX= %d' % MaxNum)
+        num = MaxNum
+    return num
+
+
+def _search_page_tags(soup: 'BeautifulSoup', searchtype: str) -> list:
+    if searchtype in ('topic', 'user'):
+        return soup.findAll('div', class_='card')
+    return soup.findAll('div', class_='card-wrap', mid=True)
+
+
+def parse_Weibo_tag(tag: 'BeautifulSoup') -> dict:
     """
     从每条微博源码提取信息
     type=weibo,realtime,video时调用
@@ -327,7 +760,7 @@ def parse_Weibo_tag(tag: BeautifulSoup) -> dict:
     return d
 
 
-def parse_userortopic_tag(tag: BeautifulSoup, type='user') -> dict:
+def parse_userortopic_tag(tag: 'BeautifulSoup', type='user') -> dict:
     """
     type:
          用户 user
@@ -357,38 +790,123 @@ def get_comment(uid: 'int|str', mid: 'int|str') -> dict:
     return json-like dict
     """
     url = "https://weibo.com/ajax/statuses/buildComments"
-    params = {
+    params = _comment_params(uid, mid)
+
+    r = get_transport().get(url, params=params, headers=_headers)
+    assert r.status_code == 200
+    return _parse(r)['data']
+
+
+def _comment_params(uid, mid) -> dict:
+    return {
         "id": mid,
         "is_show_bulletin": "3",
         "count": "100",
         "uid": uid
     }
 
-    r = requests.get(url, params=params, headers=_headers)
+
+def get_comment_page(uid: 'int|str', id: 'int|str', max_id=0, level=0, count=20) -> tuple:
+    """
+    按 max_id 游标获取一页评论
+
+    level: 0 一级评论，id 为微博 mid；1 二级评论（楼中楼），id 为一级评论 id
+    max_id: 上一页返回的游标，首页为 0
+
+    return (list of json-like dict, 下一页 max_id)，max_id 为 0 表示已到最后一页
+    """
+    url = "https://weibo.com/ajax/statuses/buildComments"
+    params = _comment_page_params(uid, id, max_id, level, count)
+
+    r = get_transport().get(url, params=params, headers=_headers)
     assert r.status_code == 200
-    return json.loads(r.content)['data']
+    return _parse(r, _parse_comment_page)
+
+
+def _comment_page_params(uid, id, max_id, level, count) -> dict:
+    params = {
+        "flow": 0,
+        "is_reload": 1,
+        "id": id,
+        "is_show_bulletin": 2,
+        "is_mix": level,
+        "fetch_level": level,
+        "count": count,
+        "uid": uid
+    }
+    if max_id:
+        params['max_id'] = max_id
+    return params
+
+
+def _parse_comment_page(content: bytes) -> tuple:
+    page = json.loads(content)
+    return page['data'], page.get('max_id', 0)
+
+
+def iter_comments(uid: 'int|str', mid: 'int|str', replies=False, max_id=0):
+    """
+    沿 max_id 游标获取一条微博的全部评论，逐条产出
+
+    replies: 为 True 时为有回复的评论获取全部二级评论，放在 comment['replies']
+    max_id: 从该游标处继续获取
+
+    yield json-like dict
+    """
+    while True:
+        comments, max_id = get_comment_page(uid, mid, max_id)
+        for c in comments:
+            if replies:
+                c['replies'] = list(iter_replies(uid, c['id'])) if c.get('total_number') else []
+            yield c
+        if not max_id or not comments:
+            return
+
+
+def iter_replies(uid: 'int|str', cid: 'int|str'):
+    """
+    获取一条评论的全部二级评论
+
+    yield json-like dict
+    """
+    max_id = 0
+    while True:
+        comments, max_id = get_comment_page(uid, cid, max_id, level=1)
+        yield from comments
+        if not max_id or not comments:
+            return
 
 
 def get_uid_from_url(url: str) -> str:
+    uid = _uid_in_url(url)
+    if uid is None:
+        req_url = "https://weibo.com/ajax/profile/info"
+        r = get_transport().get(req_url, headers=_headers,
+                                params=_profile_params_from_url(url))
+        assert r.status_code == 200
+        uid = _parse(r)['data']['user']['idstr']
+    return uid
+
+
+def _uid_in_url(url: str) -> 'str|None':
+    """
+    url 中直接包含 uid 时返回 uid，否则返回 None
+    """
     if re.search(r'\d\?ref', url):
         return re.search(r'/(\d+)\?', url).group(1)
     if re.search(r'/u/', url):
-        uid = re.search(r'/(\d+)', url).group(1)
-    else:
-        req_url = "https://weibo.com/ajax/profile/info"
+        return re.search(r'/(\d+)', url).group(1)
+    return None
 
-        if re.search(r'/n/', url):
-            params = {
-                "screen_name": re.search(r'([^/]*)\Z', url).group(1)
-            }
-        else:
-            params = {
-                "custom": re.search(r'([^/]*)\Z', url).group(1)
-            }
-        r = requests.get(req_url, headers=_headers, params=params)
-        assert r.status_code == 200
-        uid = json.loads(r.text)['data']['user']['idstr']
-    return uid
+
+def _profile_params_from_url(url: str) -> dict:
+    if re.search(r'/n/', url):
+        return {
+            "screen_name": re.search(r'([^/]*)\Z', url).group(1)
+        }
+    return {
+        "custom": re.search(r'([^/]*)\Z', url).group(1)
+    }
 
 
 def get_user_info(uid: 'str|int') -> dict:
@@ -400,52 +918,74 @@ def get_user_info(uid: 'str|int') -> dict:
         "uid": uid
     }
 
-    r = requests.get(url, headers=_headers, params=params)
+    r = get_transport().get(url, headers=_headers, params=params)
     assert r.status_code == 200
-    return json.loads(r.text)
+    return _parse(r)
 
 
-def get_user_follow(uid: 'str|int', flag: '0|1', num: int) -> list:
+def get_user_follow(uid: 'str|int', flag: '0|1', num: int, compact=False, keep_raw=False) -> list:
     """
     获取粉丝或关注
 
     flag：1 粉丝 fans/followers；0 关注 followings
+    compact: 为 True 时每个用户解析为 Weiborecords.UserRecord，只保留 shortinfo 字段；
+             keep_raw=True 时记录中另外保留原始 dict
 
-    return list of json-like dict
+    return list of json-like dict (or UserRecord)
+    """
+    return list(iter_user_follow(uid, flag, num, compact, keep_raw))
+
+
+def iter_user_follow(uid: 'str|int', flag: '0|1', num: int = None, compact=False, keep_raw=False):
+    """
+    同 get_user_follow，但以生成器逐条产出；num 为 None 时获取全部
+
+    yield json-like dict (or UserRecord)
     """
     user_info_dict = get_user_info(uid)
-    num_follower = user_info_dict['data']['user']['followers_count']
-    num_following = user_info_dict['data']['user']['friends_count']
+    num = _follow_limit(user_info_dict, flag, num)
 
-    page = 1
     url = "https://weibo.com/ajax/friendships/friends"
-    params = {
-        "page": page,
-        "uid": uid
-    }
 
+    def fetch_page(page):
+        r = get_transport().get(url, headers=_headers,
+                                params=_follow_params(uid, flag, page))
+        assert r.status_code == 200
+        users = _parse(r)['users']
+        if compact:
+            return [UserRecord.from_dict(u, keep_raw) for u in users]
+        return users
+
+    # 不足 20 人的页为最后一页
+    yield from _iter_pages(fetch_page, num, _follow_page_size,
+                           is_last=lambda u_list: len(u_list) < _follow_page_size)
+
+
+def _follow_limit(user_info_dict: dict, flag, num: int) -> int:
+    """
+    按用户的粉丝数或关注数截断 num
+    """
     if flag:
-        params.update({"relate": "fans"})
-        maxnum = num_follower
+        maxnum = user_info_dict['data']['user']['followers_count']
     else:
-        maxnum = num_following
+        maxnum = user_info_dict['data']['user']['friends_count']
 
-    logger = Logger('get_user_follow')
+    if num is None:
+        return maxnum
     if num > maxnum:
         logger.warning('num too large,reset to MAX: %d' % maxnum)
         num = maxnum
+    return num
 
-    user_follow_list = []
-    while len(user_follow_list) < num:
-        r = requests.get(url, headers=_headers, params=params)
-        assert r.status_code == 200
-        u_list = json.loads(r.content)['users']
-        user_follow_list += u_list
-        if len(u_list) < 20:
-            return user_follow_list
-        page += 1
-        params['page'] = page
-    return user_follow_list[:num]
+
+def _follow_params(uid, flag, page) -> dict:
+    params = {
+        "page": page,
+        "uid": uid
+    }
+    if flag:
+        params.update({"relate": "fans"})
+    return params
 
 
 def get_user_weibo(uid: 'str|int', pages=3) -> list:
@@ -454,22 +994,35 @@ def get_user_weibo(uid: 'str|int', pages=3) -> list:
 
     return list of json-like
     """
-    page = 1
-    user_weibo_list = []
+    return list(iter_user_weibo(uid, pages))
+
+
+def iter_user_weibo(uid: 'str|int', pages=3):
+    """
+    同 get_user_weibo，但以生成器逐条产出
 
+    yield json-like dict
+    """
+    def fetch_page(page):
+        return get_user_weibo_page(uid, page)
+
+    yield from _iter_pages(fetch_page, None, 1, pages=pages)
+
+
+def get_user_weibo_page(uid: 'str|int', page=1) -> list:
+    """
+    获取用户微博的第 page 页，按时间倒序（置顶微博 isTop=1 排在最前）
+
+    return list of json-like dict
+    """
     url = "https://weibo.com/ajax/statuses/mymblog"
     params = {
         "uid": uid,
         "page": page
     }
-
-    for page in range(1, pages+1):
-        params['page'] = page
-        r = requests.get(url, headers=_headers, params=params)
-        assert r.status_code == 200
-        user_weibo_list += json.loads(r.text)['data']['list']
-
-    return user_weibo_list
+    r = get_transport().get(url, headers=_headers, params=params)
+    assert r.status_code == 200
+    return _parse(r)['data']['list']
 
 
 def get_feeds(num=30) -> list:
@@ -484,6 +1037,82 @@ def get_feeds(num=30) -> list:
         "count": num
     }
 
-    r = requests.get(url, headers=_headers, params=params)
+    r = get_transport().get(url, headers=_headers, params=params)
+    assert r.status_code == 200
+    return _parse(r)['statuses'][:num]
+
+
+def get_longtext(mblogid: str) -> str:
+    """
+    获取被折叠（展开）微博的全文
+
+    return html str
+    """
+    url = "https://weibo.com/ajax/statuses/longtext"
+    params = {
+        "id": mblogid
+    }
+
+    r = get_transport().get(url, headers=_headers, params=params)
+    assert r.status_code == 200
+    return _parse(r)['data']['longTextContent']
+
+
+def get_status(mblogid: str) -> dict:
+    """
+    通过 mblogid 获取单条微博
+
+    return json-like dict
+    """
+    url = "https://weibo.com/ajax/statuses/show"
+    params = {
+        "id": mblogid
+    }
+
+    r = get_transport().get(url, headers=_headers, params=params)
+    assert r.status_code == 200
+    return _parse(r)
+
+
+def forget_status(mblogid: str):
+    """
+    从响应缓存中删除该微博的全文（get_longtext）和 get_status 响应，下次获取时重新请求
+    """
+    invalidate("https://weibo.com/ajax/statuses/longtext", {"id": mblogid})
+    invalidate("https://weibo.com/ajax/statuses/show", {"id": mblogid})
+
+
+def get_video_urls(video_id: str) -> 'dict|None':
+    """
+    通过视频 fid (形如 1034:4700000000000000) 获取播放地址
+
+    return dict of {清晰度:url} or None
+    """
+    url = "https://weibo.com/tv/api/component"
+    params, headers_dict = _video_request(video_id)
+
+    r = get_transport().post(url, params=params, headers=headers_dict)
     assert r.status_code == 200
-    return json.loads(r.text)['statuses'][:num]
+    return _parse(r, _parse_video_urls)
+
+
+def _video_request(video_id: str):
+    params = {
+        "data": "{\"Component_Play_Playinfo\":{\"oid\":\""+video_id+"\"}}",
+    }
+    headers_dict = {
+        "Referer": "https://weibo.com/tv/show/"+video_id+"?from=old_pc_videoshow"
+    }
+    headers_dict.update(_headers)
+    return params, headers_dict
+
+
+def _parse_video_urls(content: bytes) -> 'dict|None':
+    content_dict = json.loads(content)
+
+    def has_url(d):
+        return ('data' in d) and (isinstance(d['data'], dict)) and ('Component_Play_Playinfo' in d['data']) and (isinstance(d['data']['Component_Play_Playinfo'], dict)) and ('urls' in d['data']['Component_Play_Playinfo'])
+
+    if has_url(content_dict):
+        return content_dict['data']['Component_Play_Playinfo']['urls']
+    return None
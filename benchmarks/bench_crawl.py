@@ -0,0 +1,155 @@
+"""
+离线爬取基准
+
+启动 mockserver 中的本地替身服务器，通过改写 url 的传输层运行
+WeiboSpyder.hotWeibos、WeiboSpyder.search、User.fans、Comment.comment 等场景，
+media_serial / media_batch 对比逐条访问 text、media 与 resolve_media 批量获取，
+每个场景报告请求数、req/s、请求延迟 p50/p99、每页解析耗时和峰值内存。
+
+峰值内存在单独一轮带 tracemalloc 的运行中测得，避免 tracemalloc 拖慢计时。
+默认关闭响应缓存，客户端限速设得足够高，测的是爬取路径本身；
+--max-rps 打开服务端限流，可观察自适应限速的效果；
+--parse-processes N 时搜索结果页在 N 个进程中解析（Weiboutils.set_parse_processes）。
+
+usage: python benchmarks/bench_crawl.py [--latency 0.02] [--max-rps 0] [--client-rps 1000]
+                                         [--workers 8] [--parse-processes 0] [--cache] [--no-memory]
+                                         [scenario ...]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import Weibometrics  # noqa: E402
+import Weibotransport  # noqa: E402
+import Weiboutils as WBapi  # noqa: E402
+from WeiboSpyder import Comment, User, WeiboSpyder, resolve_media  # noqa: E402
+from mockserver import LocalTransport, MockWeibo  # noqa: E402
+
+
+class Recorder:
+    """
+    Weibometrics hook，收集请求延迟和解析耗时
+    """
+
+    def __init__(self) -> None:
+        self.latencies = []
+        self.parse_times = []
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self.latencies = []
+            self.parse_times = []
+
+    def __call__(self, event: dict):
+        with self._lock:
+            if event['kind'] == 'parse':
+                self.parse_times.append(event['seconds'])
+            else:
+                self.latencies.append(event['seconds'])
+
+
+def _percentile(values: list, p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+scenarios = {
+    'hotWeibos': lambda spyder: spyder.hotWeibos('24小时榜', 400),
+    'search': lambda spyder: spyder.search('天气', 'weibo', 100),
+    'search_user': lambda spyder: spyder.search('天气', 'user', 60),
+    'fans': lambda spyder: User(1669879400).fans,
+    'comment': lambda spyder: Comment(1669879400, 4700000000000000).comment,
+    'iter_comment': lambda spyder: list(Comment(1669879400, 4700000000000000).iter_comment()),
+    'search_many': lambda spyder: list(spyder.iter_search_many(
+        [('关键词%d' % i, t, 50) for i in range(5) for t in ('weibo', 'realtime', 'video')], dedupe=False)),
+    'media_serial': lambda spyder: [(w.text, w.media) for w in spyder.hotWeibos('24小时榜', 400)],
+    'media_batch': lambda spyder: resolve_media(spyder.hotWeibos('24小时榜', 400)),
+}
+
+
+def run(name, spyder, recorder: Recorder, server: MockWeibo, memory=False) -> dict:
+    cache = Weibotransport.get_response_cache()
+    if cache is not None:
+        cache.clear()
+    recorder.reset()
+    requests_before = server.requests
+    throttled_before = server.throttled
+    if memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    items = scenarios[name](spyder)
+    elapsed = time.perf_counter() - start
+    peak = 0
+    if memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return {
+        'items': len(items),
+        'requests': len(recorder.latencies),
+        'server_requests': server.requests - requests_before,
+        'throttled': server.throttled - throttled_before,
+        'seconds': elapsed,
+        'rps': len(recorder.latencies) / elapsed if elapsed else 0.0,
+        'p50': _percentile(recorder.latencies, 0.5),
+        'p99': _percentile(recorder.latencies, 0.99),
+        'parse': sum(recorder.parse_times) / len(recorder.parse_times) if recorder.parse_times else 0.0,
+        'peak': peak,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('scenario', nargs='*', default=list(scenarios))
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--max-rps', type=int, default=0)
+    parser.add_argument('--client-rps', type=float, default=1000.0)
+    parser.add_argument('--workers', type=int, default=WBapi.page_workers)
+    parser.add_argument('--parse-processes', type=int, default=0)
+    parser.add_argument('--cache', action='store_true')
+    parser.add_argument('--no-memory', action='store_true')
+    args = parser.parse_args()
+
+    server = MockWeibo(latency=args.latency, max_rps=args.max_rps).start()
+    recorder = Recorder()
+    WBapi.page_workers = args.workers
+    WBapi.set_parse_processes(args.parse_processes)
+    Weibometrics.add_hook(recorder)
+    Weibotransport.set_transport(LocalTransport(
+        server.base_url, pool_size=max(10, args.workers)))
+    Weibotransport.set_rate_limiter(Weibotransport.RateLimiter(
+        args.client_rps, burst=args.workers,
+        rates={family: args.client_rps for family in Weibotransport.RateLimiter.default_rates}))
+    if not args.cache:
+        Weibotransport.set_response_cache(None)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        WBapi.cookies_path = os.path.join(tmp, 'weibo_cookies.txt')
+        spyder = WeiboSpyder('SUB=bench')
+
+        print('latency=%.3fs max-rps=%s client-rps=%s workers=%d parse-processes=%d cache=%s' % (
+            args.latency, args.max_rps or '-', args.client_rps, args.workers, args.parse_processes, args.cache))
+        print('%-13s %6s %5s %5s %8s %8s %8s %8s %10s %8s' % (
+            'scenario', 'items', 'reqs', '418', 'seconds', 'req/s', 'p50 ms', 'p99 ms', 'parse ms', 'peak MB'))
+        for name in args.scenario:
+            result = run(name, spyder, recorder, server)
+            if not args.no_memory:
+                result['peak'] = run(name, spyder, recorder, server, memory=True)['peak']
+            print('%-13s %6d %5d %5d %8.2f %8.1f %8.1f %8.1f %10.2f %8s' % (
+                name, result['items'], result['requests'], result['throttled'], result['seconds'],
+                result['rps'], result['p50'] * 1000, result['p99'] * 1000, result['parse'] * 1000,
+                '-' if args.no_memory else '%.2f' % (result['peak'] / 2 ** 20)))
+    server.shutdown()
+    WBapi.set_parse_processes(0)
+
+
+if __name__ == '__main__':
+    main()
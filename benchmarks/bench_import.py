@@ -0,0 +1,76 @@
+"""
+启动耗时基准：在全新的解释器进程中计时 import WeiboSpyder
+
+短生命周期的 worker 进程和定时任务每次启动都要付出这部分开销。
+每个模块各启动 repeat 次取中位数和最小值，并列出导入后已加载的重量级依赖
+（这些依赖应当只在用到时才导入）；--top N 时另外用 -X importtime 列出
+累计耗时最多的 N 个模块。
+
+usage: python benchmarks/bench_import.py [--repeat 10] [--top 15] [module ...]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# 只有部分接口用到、不应在 import 时加载的依赖
+heavy = ('pandas', 'numpy', 'bs4', 'pyarrow', 'aiohttp', 'asyncio')
+
+_timer = '''
+import sys, time
+start = time.perf_counter()
+import %s
+elapsed = time.perf_counter() - start
+print(elapsed, ','.join(m for m in %r if m in sys.modules))
+'''
+
+
+def time_import(module: str) -> tuple:
+    """
+    return (秒, 已加载的重量级依赖列表)
+    """
+    out = subprocess.run([sys.executable, '-c', _timer % (module, heavy)],
+                         cwd=root, check=True, capture_output=True, text=True).stdout
+    elapsed, loaded = out.split(' ')
+    return float(elapsed), [m for m in loaded.strip().split(',') if m]
+
+
+def importtime(module: str, top: int) -> list:
+    """
+    return [(累计微秒, 模块名)]，按耗时降序
+    """
+    err = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+                         cwd=root, check=True, capture_output=True, text=True).stderr
+    rows = []
+    for line in err.splitlines():
+        parts = line.split('|')
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            rows.append((int(parts[1]), parts[2].strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('modules', nargs='*', default=['WeiboSpyder'])
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--top', type=int, default=0)
+    args = parser.parse_args()
+
+    print('%-18s %10s %10s  %s' % ('module', 'median ms', 'min ms', 'heavy deps loaded'))
+    for module in args.modules:
+        times = []
+        for _ in range(args.repeat):
+            elapsed, loaded = time_import(module)
+            times.append(elapsed)
+        print('%-18s %10.1f %10.1f  %s' % (module, statistics.median(times) * 1000,
+                                         min(times) * 1000, ', '.join(loaded) or '-'))
+        if args.top:
+            for us, name in importtime(module, args.top):
+                print('    %8.1f ms  %s' % (us / 1000, name))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+搜索结果页解析基准：BeautifulSoup 路径 vs Weiboparser (lxml/XPath) 路径
+
+在 fixtures/ 下保存的搜索结果页上分别计时，并检查两条路径的解析结果一致
+（text.raw 只比较文本，两者的 html 序列化方式不同）。
+
+usage: python benchmarks/bench_parser.py [repeat]
+"""
+import os
+import sys
+import time
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import Weiboutils as WBapi  # noqa: E402
+import Weiboparser  # noqa: E402
+
+fixtures = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+def parse_bs4(page: str, searchtype: str) -> list:
+    tags = WBapi._search_page_tags(BeautifulSoup(page, 'lxml'), searchtype)
+    if searchtype in ('topic', 'user'):
+        return [WBapi.parse_userortopic_tag(t, searchtype) for t in tags]
+    return [WBapi.parse_Weibo_tag(t) for t in tags]
+
+
+def parse_lxml(page: str, searchtype: str) -> list:
+    return Weiboparser.parse_search_page(page, searchtype)
+
+
+def _comparable(items: list) -> list:
+    for d in items:
+        if 'content' in d:
+            d['content']['text'].pop('raw')
+    return items
+
+
+def timeit(func, page, searchtype, repeat) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(page, searchtype)
+    return (time.perf_counter() - start) / repeat
+
+
+def main(repeat=50):
+    print('%-8s %6s %12s %12s %8s %6s' %
+          ('type', 'cards', 'bs4 ms/page', 'lxml ms/page', 'speedup', 'same'))
+    for searchtype in ('weibo', 'user', 'topic'):
+        with open(os.path.join(fixtures, 'search_%s.html' % searchtype), encoding='utf-8') as fp:
+            page = fp.read()
+        same = _comparable(parse_bs4(page, searchtype)) == _comparable(
+            parse_lxml(page, searchtype))
+        t_bs4 = timeit(parse_bs4, page, searchtype, repeat)
+        t_lxml = timeit(parse_lxml, page, searchtype, repeat)
+        print('%-8s %6d %12.2f %12.2f %7.1fx %6s' % (
+            searchtype, len(parse_lxml(page, searchtype)), t_bs4 * 1000, t_lxml * 1000, t_bs4 / t_lxml, same))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
@@ -0,0 +1,216 @@
+"""
+本地 weibo 替身服务器
+
+回放 fixtures/ 下录制的 hot_band、allGroups、hottimeline、s.weibo.com 搜索页、
+buildComments、profile/info、friendships/friends、mymblog 响应，
+并生成 statuses/longtext 和 tv/api/component（视频地址）的响应，
+可配置每个请求的延迟和限流阈值，供 benchmarks 离线运行。
+
+weibo.com 和 s.weibo.com 的请求都发往同一个端口，按 path 区分；
+客户端一侧用 LocalTransport 把请求改写到本服务器。
+
+usage: python benchmarks/mockserver.py [--port 8000] [--latency 0.05] [--max-rps 20]
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import Weibotransport  # noqa: E402
+
+fixtures = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+def _load(name: str):
+    with open(os.path.join(fixtures, name), 'rb') as fp:
+        content = fp.read()
+    return json.loads(content) if name.endswith('.json') else content
+
+
+class MockWeibo(ThreadingHTTPServer):
+    """
+    latency: 每个请求的固定延迟秒数
+    max_rps: 每秒最多处理的请求数，超出时返回 418；0 表示不限流
+    search_pages: 搜索结果的页数，之后的页为空结果页
+    comment_pages: 每条微博的评论页数
+    """
+
+    daemon_threads = True
+
+    def __init__(self, port=0, latency=0.0, max_rps=0, search_pages=10, comment_pages=5) -> None:
+        super().__init__(('127.0.0.1', port), _Handler)
+        self.latency = latency
+        self.max_rps = max_rps
+        self.search_pages = search_pages
+        self.comment_pages = comment_pages
+        self.requests = 0
+        self.throttled = 0
+        self._recent = deque()
+        self._lock = threading.Lock()
+
+        self.json = {name: _load(name + '.json') for name in (
+            'hot_band', 'allGroups', 'hottimeline', 'buildComments',
+            'profile_info', 'friendships_friends', 'mymblog')}
+        self.static = {path: json.dumps(self.json[name]).encode() for path, name in (
+            ('/ajax/statuses/hot_band', 'hot_band'),
+            ('/ajax/feed/allGroups', 'allGroups'),
+            ('/ajax/profile/info', 'profile_info'),
+            ('/ajax/statuses/mymblog', 'mymblog'))}
+        self.html = {searchtype: _load('search_%s.html' % searchtype)
+                     for searchtype in ('weibo', 'user', 'topic')}
+        self.empty_html = '<html><body><div class="card card-no-result"><p>抱歉，未找到相关结果。</p></div></body></html>'.encode()
+        user = self.json['profile_info']['data']['user']
+        self.fans_pages = -(-user['followers_count'] // 20)
+        self.follow_pages = -(-user['friends_count'] // 20)
+        self._hot_pages = {}
+        self._search_pages = {}
+
+    @property
+    def base_url(self) -> str:
+        return 'http://%s:%d' % self.server_address
+
+    def search_page(self, searchtype: str, page: int) -> bytes:
+        """
+        搜索结果第 page 页：分页栏列出全部 search_pages 页，最后一页没有"下一页"
+        """
+        key = (searchtype, page)
+        body = self._search_pages.get(key)
+        if body is None:
+            items = ''.join('<li%s><a href="?q=天气&page=%d">第%d页</a></li>' % (
+                ' class="cur"' if n == page else '', n, n) for n in range(1, self.search_pages + 1))
+            next_page = '<a class="next" href="?q=天气&page=%d">下一页</a>' % (page + 1) if page < self.search_pages else ''
+            m_page = '<div class="m-page"><div><span class="list"><ul class="s-scroll">%s</ul></span>%s</div></div>' % (
+                items, next_page)
+            html = self.html[searchtype].decode()
+            body = self._search_pages[key] = re.sub(
+                r'<div class="m-page">.*?</div></div>', lambda m: m_page, html, count=1, flags=re.S).encode()
+        return body
+
+    def hottimeline(self, page: int) -> bytes:
+        """
+        热门微博第 page 页：以 fixture 为模板，id、mblogid 和视频 fid 每页不同
+        """
+        body = self._hot_pages.get(page)
+        if body is None:
+            statuses = []
+            for i, w in enumerate(self.json['hottimeline']['statuses']):
+                w = dict(w)
+                n = page * 10 + i
+                w['id'] = w['id'] - i + n
+                w['mid'] = w['idstr'] = str(w['id'])
+                w['mblogid'] = 'Mb%07d' % n
+                if 'url_struct' in w:
+                    w['url_struct'] = [dict(w['url_struct'][0], long_url='https://video.weibo.com/show?fid=1034:%d' % w['id'])]
+                statuses.append(w)
+            body = self._hot_pages[page] = json.dumps(dict(self.json['hottimeline'], statuses=statuses)).encode()
+        return body
+
+    def admit(self) -> bool:
+        with self._lock:
+            self.requests += 1
+            if not self.max_rps:
+                return True
+            now = time.monotonic()
+            while self._recent and self._recent[0] < now - 1:
+                self._recent.popleft()
+            if len(self._recent) >= self.max_rps:
+                self.throttled += 1
+                return False
+            self._recent.append(now)
+            return True
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        self.do_GET()
+
+    def do_GET(self):
+        server = self.server
+        url = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        if server.latency:
+            time.sleep(server.latency)
+        if not server.admit():
+            return self._send(418, b'', 'text/plain')
+
+        path = url.path
+        if path in server.static:
+            return self._send(200, server.static[path])
+        if path in ('/weibo', '/realtime', '/video', '/user', '/topic'):
+            searchtype = 'weibo' if path in ('/weibo', '/realtime', '/video') else path[1:]
+            page = int(params.get('page', 1))
+            body = server.search_page(searchtype, page) if page <= server.search_pages else server.empty_html
+            return self._send(200, body, 'text/html; charset=utf-8')
+        if path == '/ajax/feed/hottimeline':
+            return self._send(200, server.hottimeline(int(params.get('max_id', 0))))
+        if path == '/ajax/statuses/buildComments':
+            page = dict(server.json['buildComments'])
+            page_no = int(params.get('max_id', 0))
+            page['max_id'] = page_no + 1 if page_no + 1 < server.comment_pages else 0
+            return self._send(200, json.dumps(page).encode())
+        if path == '/ajax/friendships/friends':
+            pages = server.fans_pages if params.get('relate') == 'fans' else server.follow_pages
+            page = dict(server.json['friendships_friends'])
+            if int(params.get('page', 1)) > pages:
+                page['users'] = []
+            return self._send(200, json.dumps(page).encode())
+        if path == '/ajax/statuses/longtext':
+            return self._send(200, json.dumps({'data': {'longTextContent': '全文 ' + params.get('id', '')}}).encode())
+        if path == '/tv/api/component':
+            oid = json.loads(params.get('data', '{}')).get('Component_Play_Playinfo', {}).get('oid', '')
+            urls = {'高清 720P': 'https://f.video.weibocdn.com/%s.mp4' % oid}
+            return self._send(200, json.dumps({'code': '100000', 'data': {'Component_Play_Playinfo': {'urls': urls}}}).encode())
+        return self._send(404, b'{}')
+
+    def _send(self, status, body: bytes, content_type='application/json'):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class LocalTransport(Weibotransport.Transport):
+    """
+    把发往 weibo.com 和 s.weibo.com 的请求改写到本地替身服务器
+    """
+
+    def __init__(self, base_url: str, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.base_url = base_url
+
+    def request(self, method: str, url: str, **kwargs):
+        url = url.replace('https://s.weibo.com', self.base_url).replace(
+            'https://weibo.com', self.base_url)
+        return super().request(method, url, **kwargs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--max-rps', type=int, default=0)
+    args = parser.parse_args()
+    server = MockWeibo(args.port, args.latency, args.max_rps)
+    print('serving on', server.base_url)
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
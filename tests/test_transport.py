@@ -0,0 +1,76 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from Weibotransport import TokenBucket  # noqa: E402
+
+
+def _achieved_rate(times: list, burst: int) -> float:
+    """
+    放行时刻 --> 扣除初始 burst 之后的平均速率
+    """
+    times = sorted(times)
+    return (len(times) - burst) / (times[-1] - times[0])
+
+
+def test_many_threads_do_not_exceed_rate():
+    rate, burst, n = 20.0, 2, 60
+    bucket = TokenBucket(rate, burst)
+    times = []
+    lock = threading.Lock()
+
+    def worker():
+        bucket.acquire()
+        with lock:
+            times.append(time.monotonic())
+
+    threads = [threading.Thread(target=worker) for _ in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(times) == n
+    assert 0.8 * rate <= _achieved_rate(times, burst) <= 1.1 * rate
+
+
+def test_many_coroutines_do_not_exceed_rate():
+    rate, burst, n = 20.0, 2, 60
+    bucket = TokenBucket(rate, burst)
+    times = []
+
+    async def worker():
+        await bucket.acquire_async()
+        times.append(time.monotonic())
+
+    async def main():
+        await asyncio.gather(*[worker() for _ in range(n)])
+
+    asyncio.run(main())
+    assert len(times) == n
+    assert 0.8 * rate <= _achieved_rate(times, burst) <= 1.1 * rate
+
+
+def test_waiters_follow_decreased_rate():
+    rate, burst, n = 20.0, 1, 20
+    bucket = TokenBucket(rate, burst)
+    times = []
+    lock = threading.Lock()
+
+    def worker():
+        bucket.acquire()
+        with lock:
+            times.append(time.monotonic())
+
+    threads = [threading.Thread(target=worker) for _ in range(n)]
+    for t in threads:
+        t.start()
+    time.sleep(0.1)
+    bucket.throttled()
+    bucket.throttled()  # 同一冷却窗口内只降速一次
+    assert bucket.rate == rate / 2
+    for t in threads:
+        t.join()
+    assert _achieved_rate(times, burst) <= 0.75 * rate